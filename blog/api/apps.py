@@ -1,6 +1,29 @@
+import logging
+import time
+
 from django.apps import AppConfig
 
+logger = logging.getLogger(__name__)
+
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+    # Seconds spent building the API schemas in ready().
+    schemas_build_time: float | None = None
+
+    def ready(self):
+        from api import signals  # noqa: F401
+        from api.models import Base
+
+        start = time.perf_counter()
+        count = sum(
+            schema is not None
+            for model in self.get_models()
+            if issubclass(model, Base)
+            for schema in model.build_schemas()
+        )
+        self.schemas_build_time = time.perf_counter() - start
+        logger.info(
+            "Built %d API schemas in %.1f ms", count, self.schemas_build_time * 1000
+        )
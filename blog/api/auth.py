@@ -1,8 +1,15 @@
+import hashlib
+import time
+
+from joserfc import jwt, errors
 from ninja_aio.models import ModelUtil
 from ninja_aio.auth import AsyncJwtBearer
+from ninja_aio.exceptions import NotFoundError
 from ninja_aio.schemas import ObjectQuerySchema
 from django.conf import settings
 
+from api.cache import author_cache, jwt_cache
+from api.metrics import timed
 from api.models import Author
 
 
@@ -23,39 +30,62 @@ CLAIMS = {
 }
 
 
-class AuthorAuth(AsyncJwtBearer):
+async def get_author(request, username: str) -> Author:
+    """Resolve the token subject, hitting the database only on cache misses."""
+    author = author_cache.get(username)
+    if author is None:
+        author = await ModelUtil(Author).get_object(
+            request,
+            query_data=ObjectQuerySchema(getters={"username": username}),
+        )
+        author_cache.set(username, author)
+    return author
+
+
+class CachedJwtBearer(AsyncJwtBearer):
+    """
+    Skip signature and claims verification for tokens already verified by
+    this bearer class. Entries expire together with the token ``exp``.
+    """
+
+    async def authenticate(self, request, token: str):
+        with timed("auth"):
+            key = (self.__class__.__name__, hashlib.sha256(token.encode()).digest())
+            dcd = jwt_cache.get(key)
+            if dcd is None:
+                try:
+                    dcd = jwt.decode(
+                        token, self.jwt_public, algorithms=self.algorithms
+                    )
+                    self.validate_claims(dcd.claims)
+                except (ValueError, errors.JoseError):
+                    return False
+                jwt_cache.set(key, dcd, ttl=dcd.claims["exp"] - time.time())
+            self.dcd = dcd
+            return await self.auth_handler(request)
+
+
+class AuthorAuth(CachedJwtBearer):
     jwt_public = JWT_PUBLIC
     claims = CLAIMS | {"access": ESSENTIAL_CLAIM}
     algorithms = [settings.JWT_ALGORITHM]
 
     async def auth_handler(self, request):
         try:
-            util = ModelUtil(Author)
-            request.author = await util.get_object(
-                request,
-                query_data=ObjectQuerySchema(
-                    getters={"username": self.dcd.claims["sub"]}
-                ),
-            )
-        except Author.DoesNotExist:
+            request.author = await get_author(request, self.dcd.claims["sub"])
+        except NotFoundError:
             return False
         return request.author
 
 
-class RefreshAuth(AsyncJwtBearer):
+class RefreshAuth(CachedJwtBearer):
     jwt_public = JWT_PUBLIC
     claims = CLAIMS | {"refresh": ESSENTIAL_CLAIM}
     algorithms = [settings.JWT_ALGORITHM]
 
     async def auth_handler(self, request):
         try:
-            util = ModelUtil(Author)
-            request.author = await util.get_object(
-                request,
-                query_data=ObjectQuerySchema(
-                    getters={"username": self.dcd.claims["sub"]}
-                ),
-            )
-        except Author.DoesNotExist:
+            request.author = await get_author(request, self.dcd.claims["sub"])
+        except NotFoundError:
             return False
         return request.author
@@ -0,0 +1,326 @@
+"""
+Batch create, update and delete endpoints for viewsets, and bulk M2M
+attach/detach.
+
+Items are validated one by one so each failure is reported with its index
+instead of failing the whole request. The valid ones are then written with
+``bulk_create``/``bulk_update``/a single delete in one transaction, with
+counters reconciled once (see ``api.counters.deferred``).
+"""
+
+from collections import Counter
+from itertools import product
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.db.models import QuerySet
+from django.utils import timezone
+from ninja_aio.decorators import api_delete, api_patch, api_post
+from ninja_aio.schemas import GenericMessageSchema
+from pydantic import ValidationError
+
+from api import counters, feed, models, schema
+from api.cache import author_cache
+from api.response_cache import response_cache
+from api.taxonomy import TAXONOMY_MODELS, taxonomy_index
+
+
+class BatchResult:
+    def __init__(self):
+        self.results: list = []
+        self.errors: dict[int, dict] = {}
+
+    def fail(self, index: int, field: str, message: str):
+        self.errors.setdefault(index, {})[field] = message
+
+    def failed(self, index: int) -> bool:
+        return index in self.errors
+
+    def to_dict(self) -> dict:
+        return {
+            "results": {"count": len(self.results), "details": self.results},
+            "errors": {
+                "count": len(self.errors),
+                "details": [
+                    {"index": index, "errors": errors}
+                    for index, errors in sorted(self.errors.items())
+                ],
+            },
+        }
+
+
+def _validation_errors(exc: ValidationError) -> dict:
+    return {
+        ".".join(map(str, error["loc"])) or "__all__": error["msg"]
+        for error in exc.errors()
+    }
+
+
+class BatchViewSetMixin:
+    """
+    Adds ``POST``, ``PATCH`` and ``DELETE`` on ``/batch`` to a viewset. The
+    update endpoint only works for models with an UpdateSerializer, like
+    the single object one.
+    """
+
+    @staticmethod
+    def _validate_items(
+        result: BatchResult, schema_class, items: list[dict], partial: bool = False
+    ) -> dict[int, dict]:
+        payloads = {}
+        for index, item in enumerate(items):
+            try:
+                # Aliases are the attnames, e.g. author_id for author.
+                payloads[index] = schema_class.model_validate(item).model_dump(
+                    by_alias=True, exclude_unset=partial
+                )
+            except ValidationError as exc:
+                result.errors[index] = _validation_errors(exc)
+        return payloads
+
+    async def _check_relations(self, result: BatchResult, payloads: dict):
+        """Fail items pointing at missing related rows, one query per relation."""
+        for field in self.model._meta.concrete_fields:
+            if not field.is_relation:
+                continue
+            wanted = {
+                payload[field.attname]
+                for payload in payloads.values()
+                if payload.get(field.attname) is not None
+            }
+            if not wanted:
+                continue
+            found = {
+                pk
+                async for pk in field.related_model.objects.filter(
+                    pk__in=wanted
+                ).values_list("pk", flat=True)
+            }
+            for index, payload in payloads.items():
+                value = payload.get(field.attname)
+                if value is not None and value not in found:
+                    result.fail(index, field.attname, "not found")
+
+    async def _check_unique(self, result: BatchResult, payloads: dict, exclude=()):
+        """Fail items clashing with each other or with stored rows."""
+        for field in self.model._meta.concrete_fields:
+            if not field.unique or field.primary_key:
+                continue
+            values = {
+                index: payload[field.attname]
+                for index, payload in payloads.items()
+                if field.attname in payload and not result.failed(index)
+            }
+            if not values:
+                continue
+            taken = {
+                value
+                async for value in self.model.objects.filter(
+                    **{f"{field.attname}__in": values.values()}
+                )
+                .exclude(pk__in=exclude)
+                .values_list(field.attname, flat=True)
+            }
+            seen = Counter()
+            for index, value in values.items():
+                seen[value] += 1
+                if value in taken or seen[value] > 1:
+                    result.fail(index, field.attname, "already exists")
+
+    async def _invalidate(self, tracked: counters.PendingCounters | None = None):
+        # Bulk writes send no signals, see api.signals.
+        await response_cache.ainvalidate(self.model, models.Post, models.Author)
+        if self.model in TAXONOMY_MODELS.values():
+            taxonomy_index.expire_names(self.model)
+        for author_id in tracked.authors if tracked else ():
+            author_cache.delete_where(lambda cached: cached.pk == author_id)
+
+    @api_post(
+        "/batch",
+        response={200: schema.BatchSchemaOut, 400: GenericMessageSchema},
+    )
+    async def batch_create(self, request, data: schema.BatchSchemaIn):
+        """Create many objects in one transaction, reporting failures by index."""
+        result = BatchResult()
+        payloads = self._validate_items(result, self.schema_in, data.items)
+        await self._check_relations(result, payloads)
+        await self._check_unique(result, payloads)
+        objs = [
+            self.model(**payload)
+            for index, payload in payloads.items()
+            if not result.failed(index)
+        ]
+        for obj in objs:
+            obj.update_excerpt()
+
+        @sync_to_async
+        def write():
+            with transaction.atomic(), counters.deferred() as tracked:
+                self.model.objects.bulk_create(objs)
+                feed.save_entries(objs)
+                tracked.track(*objs)
+            return tracked
+
+        if objs:
+            await self._invalidate(await write())
+        result.results = [str(obj.pk) for obj in objs]
+        return result.to_dict()
+
+    @api_patch(
+        "/batch",
+        response={200: schema.BatchSchemaOut, 400: GenericMessageSchema},
+    )
+    async def batch_update(self, request, data: schema.BatchSchemaIn):
+        """Update many objects, each item carrying its ``id``."""
+        if self.schema_update is None:
+            return 400, {"message": "This model can't be updated."}
+        result = BatchResult()
+        ids, seen = {}, set()
+        for index, item in enumerate(data.items):
+            if item.get("id") is None:
+                result.fail(index, "id", "required")
+                continue
+            try:
+                ids[index] = self.model._meta.pk.to_python(item["id"])
+            except DjangoValidationError:
+                result.fail(index, "id", "invalid id")
+                continue
+            if ids[index] in seen:
+                result.fail(index, "id", "duplicated in batch")
+            seen.add(ids[index])
+        payloads = self._validate_items(
+            result,
+            self.schema_update,
+            [{k: v for k, v in item.items() if k != "id"} for item in data.items],
+            partial=True,
+        )
+        payloads = {i: p for i, p in payloads.items() if not result.failed(i)}
+        queryset = await self.model_util.get_objects(request)
+        objs = {
+            obj.pk: obj
+            async for obj in queryset.filter(
+                pk__in=[ids[i] for i in payloads if ids.get(i) is not None]
+            )
+        }
+        for index in payloads:
+            if ids.get(index) not in objs:
+                result.fail(index, "id", "not found")
+        await self._check_unique(result, payloads, exclude=objs.keys())
+
+        now, fields, updated = timezone.now(), {"updated_at"}, []
+        for index, payload in payloads.items():
+            if result.failed(index):
+                continue
+            obj = objs[ids[index]]
+            for field, value in payload.items():
+                setattr(obj, field, value)
+            obj.updated_at = now
+            fields.update(payload)
+            if obj.excerpt_source in payload:
+                obj.update_excerpt()
+                fields.add("excerpt")
+            updated.append(obj)
+
+        @sync_to_async
+        def write():
+            with transaction.atomic():
+                self.model.objects.bulk_update(updated, fields=sorted(fields))
+                feed.save_entries(updated)
+
+        if updated:
+            await write()
+            await self._invalidate()
+        result.results = [str(obj.pk) for obj in updated]
+        return result.to_dict()
+
+    @api_delete(
+        "/batch",
+        response={200: schema.BatchSchemaOut, 400: GenericMessageSchema},
+    )
+    async def batch_delete(self, request, data: schema.BatchDeleteSchemaIn):
+        """Delete many objects, reporting the ids not found."""
+        result = BatchResult()
+        queryset = (await self.model_util.get_objects(request)).filter(
+            pk__in=data.ids
+        )
+        found, seen = {pk async for pk in queryset.values_list("pk", flat=True)}, set()
+        for index, pk in enumerate(data.ids):
+            if pk not in found:
+                result.fail(index, "id", "not found")
+            elif pk in seen:
+                result.fail(index, "id", "duplicated in batch")
+            seen.add(pk)
+
+        @sync_to_async
+        def write():
+            with transaction.atomic(), counters.deferred() as tracked:
+                queryset.filter(pk__in=found).delete()
+            return tracked
+
+        if found:
+            await self._invalidate(await write())
+        result.results = [str(pk) for pk in found]
+        return result.to_dict()
+
+
+async def bulk_relate(
+    posts: QuerySet,
+    related: QuerySet,
+    through,
+    post_ids: list,
+    related_ids: list,
+    attach: bool,
+) -> dict:
+    """
+    Attach every related object to every post, or detach them, with a single
+    ``bulk_create`` or ``DELETE`` on ``through`` after diffing against the
+    links already there. Ids missing from ``posts`` or ``related`` are
+    reported and skipped.
+    """
+    related_field = f"{related.model._meta.model_name}_id"
+    found_posts = {
+        pk async for pk in posts.filter(pk__in=post_ids).values_list("pk", flat=True)
+    }
+    found_related = {
+        pk
+        async for pk in related.filter(pk__in=related_ids).values_list("pk", flat=True)
+    }
+    links = through.objects.filter(
+        post_id__in=found_posts, **{f"{related_field}__in": found_related}
+    )
+    existing = {pair async for pair in links.values_list("post_id", related_field)}
+    wanted = set(product(found_posts, found_related))
+    changes = wanted - existing if attach else existing
+
+    @sync_to_async
+    def write():
+        with transaction.atomic():
+            if attach:
+                # A concurrent attach may have added some since the diff, the
+                # recount below reads what is there.
+                through.objects.bulk_create(
+                    (
+                        through(post_id=post_id, **{related_field: related_id})
+                        for post_id, related_id in changes
+                    ),
+                    ignore_conflicts=True,
+                )
+            else:
+                links.delete()
+            counters.recount_relation(through, {post_id for post_id, _ in changes})
+
+    if changes:
+        await write()
+        # One invalidation for the whole batch, not one m2m_changed per post.
+        await response_cache.ainvalidate(posts.model, related.model)
+        taxonomy_index.link(related.model, changes, attach)
+    return {
+        "changed": len(changes),
+        "unchanged": len(wanted) - len(changes),
+        "not_found": {
+            "post_ids": [str(pk) for pk in post_ids if pk not in found_posts],
+            f"{related_field}s": [
+                str(pk) for pk in related_ids if pk not in found_related
+            ],
+        },
+    }
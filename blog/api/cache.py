@@ -0,0 +1,106 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+from django.conf import settings
+
+
+class TTLCache:
+    """
+    Per-process LRU cache with per-entry expiry.
+
+    Operations are guarded by a plain lock so the cache can be shared between
+    coroutines on the event loop and the threads used by ``sync_to_async``
+    (model save/delete hooks run there).
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key: Hashable, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None):
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_where(self, predicate: Callable[[Any], bool]):
+        with self._lock:
+            for key in [k for k, (_, v) in self._data.items() if predicate(v)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class AuthorCache(TTLCache):
+    """
+    Authenticated authors keyed by username (the JWT ``sub`` claim).
+
+    Instances are copied in and out so a request mutating ``request.author``
+    never leaks into another request.
+    """
+
+    def get(self, key: str, default=None):
+        author = super().get(key)
+        return default if author is None else copy.copy(author)
+
+    def set(self, key: str, value, ttl: float | None = None):
+        super().set(key, copy.copy(value), ttl)
+
+    def invalidate(self, author):
+        # Match by pk as well, the cached username may be the one being
+        # changed. Django clears the pk on delete, hence the username check.
+        self.delete_where(
+            lambda cached: cached.pk == author.pk or cached.username == author.username
+        )
+
+
+author_cache = AuthorCache(
+    maxsize=settings.AUTHOR_CACHE_MAXSIZE,
+    ttl=settings.AUTHOR_CACHE_TTL,
+)
+
+jwt_cache = TTLCache(
+    maxsize=settings.JWT_CACHE_MAXSIZE,
+    ttl=settings.JWT_ACCESS_DURATION,
+)
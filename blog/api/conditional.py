@@ -0,0 +1,112 @@
+"""
+Conditional GET from ``Base.updated_at``.
+
+Validators come from one cheap query run before any row is fetched: an
+aggregate ``MAX(updated_at)`` plus ``COUNT(*)`` over the filtered queryset
+for lists (inserts and updates move the max, deletes the count), the
+timestamps of the single row for retrieves. The ``updated_at`` of relations
+joined by the ReadSerializer are folded in, so e.g. renaming an author
+changes the validators of their posts. Relation counters (see
+``api.counters``) change without moving ``updated_at``: retrieves fold in
+their values, lists their sums.
+
+A match raises ``NotModified``, answered as a 304 by the API exception
+handler from wherever it is raised, e.g. before pagination runs.
+"""
+
+import hashlib
+from functools import wraps
+
+from django.db.models import Count, Max, QuerySet, Sum
+from django.http import HttpRequest, HttpResponseNotModified
+from django.utils.cache import get_conditional_response
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.http import http_date
+
+
+class NotModified(Exception):
+    def __init__(self, response: HttpResponseNotModified):
+        self.response = response
+
+
+def _validator_fields(queryset: QuerySet) -> tuple[list[str], list[str]]:
+    """The timestamp and counter fields of the rows and joined relations."""
+    model = queryset.model
+    timestamps, counters = ["updated_at"], list(model.counter_fields)
+    for name in model.util.get_select_relateds():
+        related = model._meta.get_field(name).related_model
+        timestamps.append(f"{name}__updated_at")
+        counters += [f"{name}__{field}" for field in related.counter_fields]
+    return timestamps, counters
+
+
+def _validate(request: HttpRequest, timestamps: list, *values):
+    present = [value for value in timestamps if value is not None]
+    last_modified = int(max(present).timestamp()) if present else None
+    digest = hashlib.md5(
+        repr((request.get_full_path(), timestamps, values)).encode(),
+        usedforsecurity=False,
+    ).hexdigest()
+    etag = f'"{digest}"'
+    request.validators = (etag, last_modified)
+    if get_conditional_response(request, etag=etag, last_modified=last_modified):
+        response = HttpResponseNotModified()
+        _set_validators(response, etag, last_modified)
+        raise NotModified(response)
+
+
+def _set_validators(response, etag: str, last_modified: int | None):
+    response.headers["ETag"] = etag
+    if last_modified is not None:
+        response.headers["Last-Modified"] = http_date(last_modified)
+
+
+async def check_list(request: HttpRequest, queryset: QuerySet):
+    """Raise ``NotModified`` if the client copy of the list is fresh."""
+    timestamps, counters = _validator_fields(queryset)
+    maxima = {f"max_{i}": Max(field) for i, field in enumerate(timestamps)}
+    aggregates = await queryset.order_by().aaggregate(
+        count=Count("*"),
+        **maxima,
+        **{f"sum_{i}": Sum(field) for i, field in enumerate(counters)},
+    )
+    _validate(request, [aggregates.pop(key) for key in maxima], *aggregates.values())
+
+
+async def check_object(request: HttpRequest, queryset: QuerySet, pk):
+    """
+    Raise ``NotModified`` if the client copy of the object is fresh. A
+    missing object is left to the view to report.
+    """
+    timestamps, counters = _validator_fields(queryset)
+    row = await queryset.filter(pk=pk).values_list(*timestamps, *counters).afirst()
+    if row is not None:
+        _validate(request, list(row[: len(timestamps)]), pk, *row[len(timestamps) :])
+
+
+def conditional_retrieve(viewset):
+    """Retrieve view decorator running ``check_object`` for ``viewset``."""
+
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(request, *args, **kwargs):
+            await check_object(
+                request,
+                await viewset.model_util.get_objects(request),
+                viewset._get_pk(kwargs["pk"]),
+            )
+            return await func(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class ValidatorsMiddleware(MiddlewareMixin):
+    """Send the validators computed by the view with successful responses."""
+
+    def process_response(self, request, response):
+        validators = getattr(request, "validators", None)
+        if validators is not None and response.status_code == 200:
+            _set_validators(response, *validators)
+        return response
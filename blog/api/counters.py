@@ -0,0 +1,130 @@
+"""
+Denormalized relation counters on ``Post`` and ``Author``.
+
+Creates and deletes adjust them with ``F()`` updates (see ``api.signals``),
+M2M changes recount the posts involved, and ``reconcile`` recomputes them
+in bulk to repair drift, e.g. after ``bulk_create`` or raw SQL which send
+no signals. Counter updates leave ``updated_at`` alone, conditional GET
+validators read the counters themselves (see ``api.conditional``). Bulk
+writes run under ``deferred`` instead, which recounts the touched rows
+once.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import reduce
+from operator import or_
+
+from django.apps import apps as global_apps
+from django.db.models import Count, F, IntegerField, OuterRef, Q, QuerySet, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+
+def _count(model, field: str):
+    rows = (
+        model.objects.filter(**{field: OuterRef("pk")})
+        .order_by()
+        .values(field)
+        .annotate(n=Count("*"))
+        .values("n")
+    )
+    return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+
+def post_counters(apps=global_apps) -> dict:
+    Post = apps.get_model("api", "Post")
+    return {
+        "comment_count": _count(apps.get_model("api", "Comment"), "post"),
+        "tag_count": _count(Post.tags.through, "post"),
+        "category_count": _count(Post.categories.through, "post"),
+    }
+
+
+def author_counters(apps=global_apps) -> dict:
+    return {
+        "post_count": _count(apps.get_model("api", "Post"), "author"),
+        "comment_count": _count(apps.get_model("api", "Comment"), "author"),
+    }
+
+
+def recount_relation(through, post_pks) -> int:
+    """Recount the tags or categories, per ``through``, of the given posts."""
+    Post = global_apps.get_model("api", "Post")
+    field = {
+        Post.tags.through: "tag_count",
+        Post.categories.through: "category_count",
+    }[through]
+    return reconcile(
+        Post.objects.filter(pk__in=post_pks), {field: post_counters()[field]}
+    )
+
+
+def increment(queryset: QuerySet, **deltas: int) -> int:
+    # Clamped so drift can't make a delete violate the positive constraint.
+    return queryset.update(
+        **{field: Greatest(F(field) + delta, 0) for field, delta in deltas.items()}
+    )
+
+
+def reconcile(queryset: QuerySet, counters: dict) -> int:
+    """Recount ``counters`` on the rows of ``queryset`` that drifted."""
+    expected = {f"expected_{field}": expr for field, expr in counters.items()}
+    drifted = reduce(
+        or_, (~Q(**{field: F(f"expected_{field}")}) for field in counters)
+    )
+    pks = queryset.alias(**expected).filter(drifted).values("pk")
+    return queryset.model.objects.filter(pk__in=pks).update(**counters)
+
+
+def reconcile_all() -> dict:
+    """Reconcile every counter."""
+    Post = global_apps.get_model("api", "Post")
+    Author = global_apps.get_model("api", "Author")
+    return {
+        "posts": reconcile(Post.objects.all(), post_counters()),
+        "authors": reconcile(Author.objects.all(), author_counters()),
+    }
+
+
+class PendingCounters:
+    """Posts and authors whose counters a bulk write touched."""
+
+    def __init__(self):
+        self.posts = set()
+        self.authors = set()
+
+    def track(self, *instances):
+        for instance in instances:
+            if getattr(instance, "author_id", None) is not None:
+                self.authors.add(instance.author_id)
+            if getattr(instance, "post_id", None) is not None:
+                self.posts.add(instance.post_id)
+
+
+_pending: ContextVar[PendingCounters | None] = ContextVar("pending", default=None)
+
+
+def pending() -> PendingCounters | None:
+    """The ``deferred`` block in progress, if any."""
+    return _pending.get()
+
+
+@contextmanager
+def deferred():
+    """
+    Collect the rows touched by the writes in the block, from signals or
+    ``PendingCounters.track``, and reconcile them once on exit. Use inside
+    the transaction of the writes.
+    """
+    tracked = PendingCounters()
+    token = _pending.set(tracked)
+    try:
+        yield tracked
+    finally:
+        _pending.reset(token)
+    Post = global_apps.get_model("api", "Post")
+    Author = global_apps.get_model("api", "Author")
+    if tracked.posts:
+        reconcile(Post.objects.filter(pk__in=tracked.posts), post_counters())
+    if tracked.authors:
+        reconcile(Author.objects.filter(pk__in=tracked.authors), author_counters())
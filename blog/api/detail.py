@@ -0,0 +1,34 @@
+"""
+Compound post detail: the post with its author, tags, categories and latest
+comments in one response, from a fixed four queries whatever their number.
+"""
+
+from django.db.models import QuerySet
+from ninja_aio.exceptions import NotFoundError
+
+from api import models
+
+
+async def post_detail(posts: QuerySet, pk, comments: int) -> dict:
+    """
+    Gather the detail of post ``pk`` among ``posts``, already joined with
+    its author. The queries run one after the other: Django serializes the
+    async queries of a request on its connection anyway.
+    """
+    post = await posts.filter(pk=pk).afirst()
+    if post is None:
+        raise NotFoundError(posts.model)
+    return {
+        "post": post,
+        "tags": [tag async for tag in models.Tag.objects.filter(posts=pk)],
+        "categories": [
+            category async for category in models.Category.objects.filter(posts=pk)
+        ],
+        # Newest first, like the comment lists.
+        "comments": [
+            comment
+            async for comment in models.Comment.objects.filter(
+                post=pk
+            ).select_related("author")[:comments]
+        ],
+    }
@@ -0,0 +1,40 @@
+"""
+Stored excerpts of long text fields, returned by list views instead of the
+full text (see ``Base.excerpt_source``).
+
+``make_excerpt`` and ``excerpt_expression`` compute the same value, in
+Python on save and in SQL to fill existing rows.
+"""
+
+from django.apps import apps as global_apps
+from django.db.models import Case, F, TextField, Value, When
+from django.db.models.functions import Concat, Left, Length
+from django.db.models.lookups import GreaterThan
+
+EXCERPT_LENGTH = 200
+ELLIPSIS = "…"
+
+
+def make_excerpt(text: str) -> str:
+    if len(text) <= EXCERPT_LENGTH:
+        return text
+    return text[: EXCERPT_LENGTH - len(ELLIPSIS)] + ELLIPSIS
+
+
+def excerpt_expression(field: str):
+    return Case(
+        When(
+            GreaterThan(Length(field), EXCERPT_LENGTH),
+            then=Concat(Left(field, EXCERPT_LENGTH - len(ELLIPSIS)), Value(ELLIPSIS)),
+        ),
+        default=F(field),
+        output_field=TextField(),
+    )
+
+
+def fill_all():
+    """Recompute every stored excerpt."""
+    for name in ("Post", "Comment"):
+        global_apps.get_model("api", name).objects.update(
+            excerpt=excerpt_expression("content")
+        )
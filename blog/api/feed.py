@@ -0,0 +1,59 @@
+"""
+Author activity feed: the posts and comments of each author merged in the
+``Activity`` table, newest first, so a profile page reads one indexed range
+of ``(author, created_at, id)`` instead of querying posts and comments.
+
+Entries share the id and creation time of their post or comment, which
+makes writes upserts and keeps the pagination cursor of both. They are
+saved with them (see ``api.signals``, and the bulk writers which send no
+signals) and deleted with them through their foreign keys.
+"""
+
+from typing import Iterable
+
+from django.db.models import Model
+
+from api import models
+
+FEED_MODEL_NAMES = ("post", "comment")
+FILL_BATCH_SIZE = 5000
+
+
+def entry(obj: Model) -> models.Activity:
+    kind = obj._meta.model_name
+    return models.Activity(
+        id=obj.pk,
+        created_at=obj.created_at,
+        author_id=obj.author_id,
+        kind=kind,
+        post_id=obj.pk if kind == "post" else obj.post_id,
+        comment_id=obj.pk if kind == "comment" else None,
+        title=getattr(obj, "title", ""),
+        excerpt=obj.excerpt,
+    )
+
+
+def save_entries(objs: Iterable[Model]):
+    """Create or refresh the entries of ``objs``, skipping other models."""
+    entries = [
+        entry(obj) for obj in objs if obj._meta.model_name in FEED_MODEL_NAMES
+    ]
+    models.Activity.objects.bulk_create(
+        entries,
+        update_conflicts=True,
+        unique_fields=["id"],
+        update_fields=["title", "excerpt", "updated_at"],
+    )
+
+
+def fill_all():
+    """Rebuild every entry."""
+    for model in (models.Post, models.Comment):
+        objs = []
+        queryset = model.objects.defer("content")
+        for obj in queryset.iterator(chunk_size=FILL_BATCH_SIZE):
+            objs.append(obj)
+            if len(objs) == FILL_BATCH_SIZE:
+                save_entries(objs)
+                objs = []
+        save_entries(objs)
@@ -0,0 +1,103 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from ninja_aio import exceptions
+
+
+class HashingUnavailableError(exceptions.BaseException):
+    status_code = 503
+
+
+class HashingPool:
+    """
+    Bounded executor for password hashing.
+
+    PBKDF2 runs in dedicated threads (hashlib releases the GIL) so logins
+    never block the event loop or the shared ``sync_to_async`` thread.
+    Once ``workers + max_pending`` jobs are in flight new ones are rejected
+    with a 503 instead of queueing without limit.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.in_flight = 0
+        self.peak = 0
+        self.completed = 0
+        self.rejected = 0
+        self.busy_seconds = 0.0
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="password-hashing"
+        )
+        self._lock = threading.Lock()
+
+    def _acquire(self):
+        with self._lock:
+            if self.in_flight >= self.workers + self.max_pending:
+                self.rejected += 1
+                raise HashingUnavailableError(
+                    "Too many authentication requests, retry later."
+                )
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+
+    def _release(self, elapsed: float):
+        with self._lock:
+            self.in_flight -= 1
+            self.completed += 1
+            self.busy_seconds += elapsed
+
+    async def run(self, func, *args):
+        self._acquire()
+        start = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, func, *args
+            )
+        finally:
+            self._release(time.perf_counter() - start)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "in_flight": self.in_flight,
+            "peak": self.peak,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "busy_seconds": self.busy_seconds,
+        }
+
+
+hashing_pool = HashingPool(
+    workers=settings.PASSWORD_HASHING_WORKERS,
+    max_pending=settings.PASSWORD_HASHING_MAX_PENDING,
+)
+
+
+async def amake_password(password: str) -> str:
+    return await hashing_pool.run(make_password, password)
+
+
+async def acheck_password(password: str, encoded: str) -> bool:
+    return await hashing_pool.run(check_password, password, encoded)
+
+
+def hash_password_input(func):
+    """
+    View decorator hashing ``data.password`` in the pool before the model
+    save hooks run, so ``Author.on_create_before_save`` sees it hashed.
+    """
+
+    @wraps(func)
+    async def wrapper(request, *args, **kwargs):
+        data = kwargs["data"]
+        data.password = await amake_password(data.password)
+        return await func(request, *args, **kwargs)
+
+    return wrapper
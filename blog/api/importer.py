@@ -0,0 +1,165 @@
+"""
+NDJSON import of posts, comments, tags and categories.
+
+Each line of the request body is an object like::
+
+    {"model": "post", "ref": "p1", "data": {"title": "...", "content": "..."}}
+
+``data`` is validated with the model CreateSerializer schema. ``ref`` is an
+optional client side id: later lines can use it in place of a primary key
+in their foreign keys, e.g. ``{"model": "comment", "data": {"post_id": "p1",
+...}}``. Authored objects always belong to the authenticated author.
+
+Django's ASGI handler receives the whole body before calling the view,
+spooling it to a temporary file past ``FILE_UPLOAD_MAX_MEMORY_SIZE``. The
+importer reads that spooled body line by line and writes every
+``batch_size`` lines with ``bulk_create`` in its own transaction, so memory
+is bounded by the batch and the id map rather than the body, and a failure
+only loses the batch it happened in.
+"""
+
+import time
+from collections import Counter
+from typing import Iterable
+
+import orjson
+from django.db import transaction
+from pydantic import ValidationError
+
+from api import counters, feed, models
+from api.batch import _validation_errors
+from api.cache import author_cache
+from api.response_cache import response_cache
+from api.taxonomy import taxonomy_index
+
+# Dependency order, targets of foreign keys first.
+IMPORT_MODELS = {
+    model._meta.model_name: model
+    for model in (models.Tag, models.Category, models.Post, models.Comment)
+}
+
+
+class Importer:
+    def __init__(self, author: models.Author, batch_size: int):
+        self.author = author
+        self.batch_size = batch_size
+        self.schemas = {
+            name: model.generate_create_s() for name, model in IMPORT_MODELS.items()
+        }
+        self.refs: dict[str, object] = {}
+        self.created = Counter()
+        self.batches: list[dict] = []
+        self.errors: dict[int, dict] = {}
+
+    def fail(self, line: int, field: str, message: str):
+        self.errors.setdefault(line, {})[field] = message
+
+    def _parse(self, number: int, raw: bytes):
+        """Return ``(model, instance)`` for a line, or None when it failed."""
+        try:
+            record = orjson.loads(raw)
+            name, data = record["model"], dict(record["data"])
+            model = IMPORT_MODELS[name]
+        except (orjson.JSONDecodeError, KeyError, TypeError, ValueError):
+            self.fail(number, "__all__", "expected {model, data[, ref]}")
+            return None
+        if issubclass(model, models.BaseAuthorRelated):
+            data["author_id"] = str(self.author.pk)
+        for field in model._meta.concrete_fields:
+            value = data.get(field.attname)
+            if field.is_relation and isinstance(value, str) and value in self.refs:
+                data[field.attname] = str(self.refs[value])
+        try:
+            payload = self.schemas[name].model_validate(data).model_dump(by_alias=True)
+        except ValidationError as exc:
+            self.errors[number] = _validation_errors(exc)
+            return None
+        instance = model(**payload)
+        instance.update_excerpt()
+        if (ref := record.get("ref")) is not None:
+            self.refs[str(ref)] = instance.pk
+        return model, instance
+
+    def _check(self, model, items: dict[int, object]):
+        """Drop items pointing at missing rows or clashing on unique fields."""
+        for field in model._meta.concrete_fields:
+            if field.is_relation:
+                values = {getattr(obj, field.attname) for obj in items.values()}
+                found = set(
+                    field.related_model.objects.filter(pk__in=values).values_list(
+                        "pk", flat=True
+                    )
+                )
+                for number, obj in list(items.items()):
+                    if getattr(obj, field.attname) not in found:
+                        self.fail(number, field.attname, "not found")
+                        del items[number]
+            elif field.unique and not field.primary_key:
+                values = [getattr(obj, field.attname) for obj in items.values()]
+                taken = set(
+                    model.objects.filter(
+                        **{f"{field.attname}__in": values}
+                    ).values_list(field.attname, flat=True)
+                )
+                for number, obj in list(items.items()):
+                    value = getattr(obj, field.attname)
+                    if value in taken:
+                        self.fail(number, field.attname, "already exists")
+                        del items[number]
+                    taken.add(value)
+
+    def _flush(self, batch: dict, lines: int, started: float):
+        created = Counter()
+        with transaction.atomic(), counters.deferred() as tracked:
+            # Written in dependency order so the checks of later models see
+            # the rows of earlier ones in the same transaction.
+            for model in IMPORT_MODELS.values():
+                items = batch.get(model, {})
+                self._check(model, items)
+                model.objects.bulk_create(items.values())
+                feed.save_entries(items.values())
+                tracked.track(*items.values())
+                created[model._meta.model_name] = len(items)
+        # Bulk writes send no signals, see api.signals.
+        response_cache.invalidate(*IMPORT_MODELS.values(), models.Author)
+        taxonomy_index.expire_names(models.Tag, models.Category)
+        author_cache.delete_where(lambda cached: cached.pk == self.author.pk)
+        self.created.update(created)
+        self.batches.append(
+            {
+                "index": len(self.batches),
+                "lines": lines,
+                "created": sum(created.values()),
+                "seconds": round(time.perf_counter() - started, 4),
+            }
+        )
+
+    def run(self, lines: Iterable[bytes]) -> dict:
+        batch, count, started, number = {}, 0, time.perf_counter(), 0
+        for number, raw in enumerate(lines, start=1):
+            if not raw.strip():
+                continue
+            count += 1
+            if (parsed := self._parse(number, raw)) is not None:
+                model, instance = parsed
+                batch.setdefault(model, {})[number] = instance
+            if count == self.batch_size:
+                self._flush(batch, count, started)
+                batch, count, started = {}, 0, time.perf_counter()
+        if count:
+            self._flush(batch, count, started)
+        return self.to_dict(number)
+
+    def to_dict(self, lines: int) -> dict:
+        return {
+            "lines": lines,
+            "created": {name: self.created[name] for name in IMPORT_MODELS},
+            "batches": self.batches,
+            "errors": {
+                "count": len(self.errors),
+                "details": [
+                    {"line": number, "errors": errors}
+                    for number, errors in sorted(self.errors.items())
+                ],
+            },
+        }
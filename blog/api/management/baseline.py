@@ -0,0 +1,52 @@
+"""
+Benchmark results saved as JSON baselines, for later runs to compare with.
+
+Results map a name, e.g. an endpoint, to its timings in milliseconds.
+"""
+
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+def add_arguments(parser, key: str):
+    parser.add_argument(
+        "--save-baseline", type=Path, help="Write the results to this JSON file."
+    )
+    parser.add_argument(
+        "--baseline", type=Path, help="Compare the results with this JSON file."
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help=f"Allowed {key} increase over the baseline, e.g. 0.25 for 25%%.",
+    )
+
+
+def regressions(
+    results: dict[str, dict], path: Path, key: str, tolerance: float
+) -> list[str]:
+    """
+    The ``results`` whose ``key`` timing exceeds the one saved in ``path``
+    by more than ``tolerance``. Results missing from the file are skipped.
+    """
+    baseline = json.loads(path.read_text())["results"]
+    return [
+        f"{name}: {key} {row[key]:.3f} ms, baseline {baseline[name][key]:.3f} ms"
+        for name, row in results.items()
+        if name in baseline and row[key] > baseline[name][key] * (1 + tolerance)
+    ]
+
+
+def check(command: BaseCommand, results: dict[str, dict], options, key: str, **meta):
+    """Save and compare ``results`` as the baseline options of ``command`` ask."""
+    if path := options["save_baseline"]:
+        path.write_text(json.dumps(meta | {"results": results}, indent=2))
+        command.stdout.write(f"Baseline written to {path}")
+    if path := options["baseline"]:
+        found = regressions(results, path, key, options["tolerance"])
+        if found:
+            raise CommandError("Regressions:\n" + "\n".join(found))
+        command.stdout.write(command.style.SUCCESS(f"No regression over {path}."))
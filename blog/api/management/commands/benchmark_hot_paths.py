@@ -0,0 +1,149 @@
+import statistics
+import time
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.http import HttpRequest
+from joserfc import jwt
+from ninja_aio.auth import encode_jwt
+
+from api import models
+from api.auth import JWT_PUBLIC, AuthorAuth
+from api.cache import jwt_cache
+from api.hashing import acheck_password
+from api.management import baseline
+
+PASSWORD = "Password123!"
+SERIALIZE_SIZES = (1, 100, 1000)
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the hot paths behind every request: JWT encoding and decoding, "
+        "authentication, post serialization and password hashing."
+    )
+    command_name = "benchmark_hot_paths"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=200)
+        parser.add_argument(
+            "--hash-runs",
+            type=int,
+            default=10,
+            help="Runs of the password hashing benchmarks, slow by design.",
+        )
+        baseline.add_arguments(parser, "median")
+
+    def handle(self, *args, **options):
+        author = models.Author.objects.first()
+        util = models.Post.util
+        posts = list(
+            models.Post.objects.select_related(*util.get_select_relateds())
+            .prefetch_related(*util.get_reverse_relations())[: max(SERIALIZE_SIZES)]
+        )
+        if author is None or not posts:
+            self.stdout.write(self.style.ERROR("No data, run load_data first."))
+            return
+        self.results = {}
+        runs = options["runs"]
+        claims = author._additional_jwt_claims() | {"access": True}
+        self._time(
+            "encode_jwt",
+            lambda: encode_jwt(claims=claims, duration=settings.JWT_ACCESS_DURATION),
+            runs,
+        )
+        self._time("Author.create_jwt_tokens", author.create_jwt_tokens, runs)
+
+        token = author.create_access_token()
+        bearer = AuthorAuth()
+
+        def decode():
+            # What AuthorAuth does on a token it has not verified yet.
+            bearer.validate_claims(
+                jwt.decode(token, JWT_PUBLIC, algorithms=bearer.algorithms).claims
+            )
+
+        self._time("jwt.decode + validate_claims", decode, runs)
+        async_to_sync(self._authenticate)(bearer, token, runs)
+
+        schema = models.Post.generate_read_s()
+        for size in SERIALIZE_SIZES:
+            if size > len(posts):
+                self.stdout.write(
+                    self.style.WARNING(f"Only {len(posts)} posts, skipping {size}.")
+                )
+                continue
+            page = posts[:size]
+            self._time(
+                f"serialize posts ({size})",
+                lambda: [schema.from_orm(post).model_dump() for post in page],
+                max(runs // size, 5),
+            )
+            async_to_sync(self._read_s)(schema, page, max(runs // size, 5))
+
+        hash_runs = options["hash_runs"]
+        encoded = make_password(PASSWORD)
+        self._time("make_password", lambda: make_password(PASSWORD), hash_runs)
+        async_to_sync(self._check_password)(encoded, hash_runs)
+
+        baseline.check(self, self.results, options, "median", runs=runs)
+
+    async def _authenticate(self, bearer: AuthorAuth, token: str, runs: int):
+        request = HttpRequest()
+        # Warms the author cache, the timings cover the token checks.
+        await bearer.authenticate(request, token)
+        await self._atime(
+            "AuthorAuth.authenticate (cached token)",
+            lambda: bearer.authenticate(request, token),
+            runs,
+        )
+
+        async def uncached():
+            jwt_cache.clear()
+            return await bearer.authenticate(request, token)
+
+        await self._atime("AuthorAuth.authenticate (new token)", uncached, runs)
+
+    async def _read_s(self, schema, page: list[models.Post], runs: int):
+        util = models.Post.util
+
+        async def read():
+            # What the views run per object: from_orm in a worker thread,
+            # then a JSON mode dump.
+            return [await util.read_s(schema, instance=post) for post in page]
+
+        await self._atime(f"ModelUtil.read_s posts ({len(page)})", read, runs)
+
+    async def _check_password(self, encoded: str, runs: int):
+        await self._atime(
+            "acheck_password", lambda: acheck_password(PASSWORD, encoded), runs
+        )
+
+    def _time(self, name, func, runs):
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+        self._record(name, timings)
+
+    async def _atime(self, name, func, runs):
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            await func()
+            timings.append((time.perf_counter() - start) * 1000)
+        self._record(name, timings)
+
+    def _record(self, name, timings):
+        self.results[name] = {
+            "runs": len(timings),
+            "median": round(statistics.median(timings), 4),
+            "max": round(max(timings), 4),
+        }
+        self.stdout.write(
+            f"{name}: median {statistics.median(timings):.3f} ms, "
+            f"max {max(timings):.3f} ms"
+        )
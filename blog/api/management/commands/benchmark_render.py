@@ -0,0 +1,66 @@
+import statistics
+import time
+from typing import List
+
+from django.core.management.base import BaseCommand
+from ninja import Schema
+from ninja.operation import ResponseObject
+from ninja_aio.renders import ORJSONRenderer as BaseORJSONRenderer
+from pydantic import create_model
+
+from api import models
+from api.renderers import ORJSONRenderer
+
+
+class Command(BaseCommand):
+    help = "Time serializing a post list page with NinjaAIO's renderer and ours."
+    command_name = "benchmark_render"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=200)
+        parser.add_argument("--page-size", type=int, default=100)
+
+    def handle(self, *args, **options):
+        util = models.Post.util
+        posts = list(
+            models.Post.objects.select_related(*util.get_select_relateds())
+            .prefetch_related(*util.get_reverse_relations())[: options["page_size"]]
+        )
+        if not posts:
+            self.stdout.write(self.style.ERROR("No data, run load_data first."))
+            return
+        # What ninja does with a paginated list view result.
+        response = create_model(
+            "Response",
+            response=(List[models.Post.generate_read_s()], ...),
+            __base__=Schema,
+        )
+        validated = response.model_validate(ResponseObject(posts))
+        page = {"items": validated.model_dump()["response"], "next": None}
+        self.stdout.write(f"{len(posts)} posts")
+        self._time(
+            "validate + model_dump",
+            lambda: response.model_validate(ResponseObject(posts)).model_dump(),
+            options["runs"],
+        )
+        for name, renderer in (
+            ("ninja_aio ORJSONRenderer", BaseORJSONRenderer()),
+            ("api ORJSONRenderer", ORJSONRenderer()),
+        ):
+            self._time(
+                name,
+                # The base renderer updates lists in place, pass a copy.
+                lambda: renderer.render(None, dict(page), response_status=200),
+                options["runs"],
+            )
+
+    def _time(self, name, func, runs):
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+        self.stdout.write(
+            f"{name}: median {statistics.median(timings):.3f} ms, "
+            f"max {max(timings):.3f} ms"
+        )
@@ -0,0 +1,54 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from api import models
+
+
+class Command(BaseCommand):
+    help = "Print query plans and timings for the API's hot list queries."
+    command_name = "explain_queries"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=20)
+        parser.add_argument("--page-size", type=int, default=100)
+
+    def handle(self, *args, **options):
+        post = models.Post.objects.select_related("author").first()
+        if post is None:
+            self.stdout.write(self.style.ERROR("No data, run load_data --scale N first."))
+            return
+        author = post.author
+        self.stdout.write(
+            f"{models.Post.objects.count()} posts, "
+            f"{models.Comment.objects.count()} comments"
+        )
+        page = options["page_size"]
+        cursor = list(models.Post.objects.filter(author=author)[: page * 10])[-1]
+        queries = {
+            "posts newest first": models.Post.objects.all()[:page],
+            "posts by author": models.Post.objects.filter(author=author)[:page],
+            "posts by author, page 11 (keyset)": models.Post.objects.filter(
+                Q(created_at__lt=cursor.created_at)
+                | Q(created_at=cursor.created_at, pk__lt=cursor.pk),
+                author=author,
+            )[:page],
+            "comments by author": models.Comment.objects.filter(author=author)[:page],
+            "comments of post": models.Comment.objects.filter(post=post)[:page],
+        }
+        for name, qs in queries.items():
+            self._explain(name, qs, options["runs"])
+
+    def _explain(self, name, qs, runs):
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            list(qs.all())
+            timings.append((time.perf_counter() - start) * 1000)
+        self.stdout.write(self.style.SUCCESS(f"\n{name}"))
+        self.stdout.write(qs.explain())
+        self.stdout.write(
+            f"median {statistics.median(timings):.2f} ms, max {max(timings):.2f} ms"
+        )
@@ -1,9 +1,14 @@
+import random
+import time
+from typing import Iterable, Iterator
+
 from django.db import transaction
 from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User
+from django.contrib.auth.hashers import make_password
 from ninja_aio.models import ModelSerializer
 
-from api import models
+from api import counters, feed, models
 from api.management.data import (
     AUTHORS_DATA,
     POSTS_DATA,
@@ -14,9 +19,25 @@ from api.management.data import (
 
 
 class Command(BaseCommand):
-    help = "Load initial data into the database."
+    help = (
+        "Load initial data into the database. Re-runs skip the data already "
+        "loaded, so they only add the copies of a larger --scale."
+    )
     command_name = "load_data"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scale",
+            type=int,
+            default=1,
+            help=(
+                "Multiply authors, posts and comments from the seed data by N, "
+                "e.g. --scale 33334 for ~1M posts."
+            ),
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=None, help="Random seed.")
+
     @transaction.atomic
     def handle(self, *args, **options):
         try:
@@ -27,72 +48,165 @@ class Command(BaseCommand):
             exit(1)
 
     def _handle(self, *args, **options):
-        try:
+        self.scale = options["scale"]
+        self.batch_size = options["batch_size"]
+        self.random = random.Random(options["seed"])
+        self.copies = self._missing_copies()
+        # Checked up front, a failed INSERT would break the outer transaction.
+        if User.objects.filter(username="admin").exists():
+            self.stdout.write(self.style.WARNING("Admin user already exists."))
+        else:
             User.objects.create_superuser(
                 username="admin",
                 password="Password123",
             )
-        except Exception as e:
-            self.stdout.write(self.style.WARNING(f"Admin user already exists: {e}"))
-        self._create_objects(models.Tag, TAGS_DATA)
-        self._create_objects(models.Category, CATEGORIES_DATA)
-        self._create_objects(models.Author, AUTHORS_DATA)
-        self._create_objects(
+
+        tag_ids = self._create_objects(models.Tag, TAGS_DATA, unique=True)
+        category_ids = self._create_objects(
+            models.Category, CATEGORIES_DATA, unique=True
+        )
+        author_ids = self._create_objects(
+            models.Author, self._scaled_authors(), unique=True
+        )
+        post_ids = self._create_objects(
             models.Post,
-            self._add_relation_to_data(POSTS_DATA, ["author"], [models.Author]),
-            m2m_relations=[("tags", models.Tag), ("categories", models.Category)],
+            (
+                data | {"author_id": self.random.choice(author_ids)}
+                for data in self._scaled(POSTS_DATA, "title")
+            ),
         )
         self._create_objects(
             models.Comment,
-            self._add_relation_to_data(
-                COMMENTS_DATA, ["author", "post"], [models.Author, models.Post]
+            (
+                data
+                | {
+                    "author_id": self.random.choice(author_ids),
+                    "post_id": self.random.choice(post_ids),
+                }
+                for data in self._scaled(COMMENTS_DATA)
             ),
         )
+        self._create_m2m(models.Tag.posts.through, "tag_id", tag_ids, post_ids)
+        self._create_m2m(
+            models.Category.posts.through, "category_id", category_ids, post_ids
+        )
+        # Bulk inserts send no signals to maintain the counters.
+        fixed = counters.reconcile_all()
+        self.stdout.write(
+            f"Counters: {fixed['posts']} posts, {fixed['authors']} authors updated"
+        )
         self.stdout.write(self.style.SUCCESS("Initial data loaded successfully."))
 
-    def _get_random_object(self, model):
-        return model.objects.order_by("?").first()
+    def _missing_copies(self) -> list[int]:
+        """
+        Copies of the seed data not loaded yet, recognized by the title of
+        their first post. Comments and relations go to the posts of the
+        copies created, so a copy is either loaded in full or missing.
+        """
+        first_title = POSTS_DATA[0]["title"]
+        titles = {
+            first_title if n == 0 else f"{first_title} #{n}": n
+            for n in range(self.scale)
+        }
+        loaded, names = set(), list(titles)
+        # Chunked below the bound parameter limit of SQLite.
+        for start in range(0, len(names), 500):
+            loaded.update(
+                models.Post.objects.filter(
+                    title__in=names[start : start + 500]
+                ).values_list("title", flat=True)
+            )
+        if loaded:
+            self.stdout.write(
+                self.style.WARNING(f"{len(loaded)} copies already loaded, skipped.")
+            )
+        return [n for title, n in titles.items() if title not in loaded]
+
+    def _scaled(self, data: list[dict], suffix_field: str = None) -> Iterator[dict]:
+        """Repeat seed rows for every missing copy, numbering those after the first."""
+        for n in self.copies:
+            for d in data:
+                if n and suffix_field:
+                    d = d | {suffix_field: f"{d[suffix_field]} #{n}"}
+                yield d
 
-    def _add_relation_to_data(
-        self,
-        data: list[dict],
-        relation_names: list[str],
-        related_objs: list[ModelSerializer],
-    ):
-        for d in data:
-            for relation_name, related_obj in zip(relation_names, related_objs):
-                d[relation_name] = self._get_random_object(related_obj)
-        return data
+    def _scaled_authors(self) -> Iterator[dict]:
+        # One PBKDF2 run per distinct password, not per author.
+        hashes = {}
+        for n in self.copies:
+            for data in AUTHORS_DATA:
+                password = data["password"]
+                if password not in hashes:
+                    hashes[password] = make_password(password)
+                data = data | {"password": hashes[password]}
+                if n:
+                    local, domain = data["email"].split("@")
+                    data |= {
+                        "username": f"{data['username']}.{n}",
+                        "email": f"{local}.{n}@{domain}",
+                    }
+                yield data
+
+    def _batches(self, rows: Iterable) -> Iterator[list]:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _progress(self, label: str, count: int, start: float, done: bool = False):
+        elapsed = time.perf_counter() - start
+        rate = count / elapsed if elapsed else 0
+        line = f"\r{label}: {count} rows in {elapsed:.1f}s ({rate:,.0f} rows/s)"
+        if done:
+            self.stdout.write(self.style.SUCCESS(line))
+        else:
+            self.stdout.write(line, ending="")
+            self.stdout.flush()
 
     def _create_objects(
         self,
         model: ModelSerializer,
-        data_list: list[dict],
-        m2m_relations: list[tuple[str, ModelSerializer]] = None,
-    ):
-        objs = []
-        for data in data_list:
-            obj, created = model.objects.get_or_create(**data)
-            if created:
-                self.stdout.write(
-                    self.style.SUCCESS(f"Created {model.__name__}: {obj}")
-                )
-            else:
-                self.stdout.write(
-                    self.style.WARNING(f"{model.__name__} already exists: {obj}")
-                )
-            if m2m_relations is not None:
-                for relation in m2m_relations:
-                    getattr(obj, relation[0]).add(self._get_random_object(relation[1]))
-                    self.stdout.write(
-                        self.style.SUCCESS(
-                            f"Added M2M relation {relation[0]} for {model.__name__}: {obj}"
-                        )
-                    )
-                self.stdout.write(
-                    self.style.SUCCESS(
-                        f"Added M2M relations for {model.__name__}: {obj}"
-                    )
-                )
-            objs.append(obj)
-        return objs
+        data_list: Iterable[dict],
+        unique: bool = False,
+    ) -> list:
+        """
+        Bulk insert rows and return the pool of primary keys to draw random
+        relations from. Unique models skip existing rows, so the pool is
+        read back from the database to include them.
+        """
+        start, count, ids = time.perf_counter(), 0, []
+        for batch in self._batches(data_list):
+            objs = [model(**data) for data in batch]
+            if issubclass(model, models.Base):
+                # Filled by save(), which bulk_create skips.
+                for obj in objs:
+                    obj.update_excerpt()
+            objs = model.objects.bulk_create(
+                objs,
+                batch_size=self.batch_size,
+                ignore_conflicts=unique,
+            )
+            # Bulk inserts send no signals to maintain the feed either.
+            feed.save_entries(objs)
+            count += len(objs)
+            if not unique:
+                ids.extend(obj.pk for obj in objs)
+            self._progress(model.__name__, count, start)
+        if unique:
+            ids = list(model.objects.values_list("pk", flat=True))
+        self._progress(model.__name__, count, start, done=True)
+        return ids
+
+    def _create_m2m(self, through, field: str, related_ids: list, post_ids: list):
+        """Attach one random related object to every new post."""
+        self._create_objects(
+            through,
+            (
+                {field: self.random.choice(related_ids), "post_id": post_id}
+                for post_id in post_ids
+            ),
+        )
@@ -0,0 +1,305 @@
+import asyncio
+import random
+import statistics
+import time
+from collections import defaultdict
+from urllib.parse import urlencode
+
+import orjson
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+
+from api import models
+from api.management import baseline
+from api.management.data import POSTS_DATA
+
+USERNAME_PREFIX = "loadtest."
+# Reserved TLD: tags the seeded authors, no real address can match it.
+EMAIL_DOMAIN = "loadtest.invalid"
+PASSWORD = "Password123!"
+# Relative frequency of each action of a virtual user.
+WEIGHTS = {
+    "feed": 40,
+    "posts": 20,
+    "search": 15,
+    "create_post": 10,
+    "comment_burst": 10,
+    "login": 5,
+}
+SEARCH_TERMS = sorted(
+    {
+        word.lower()
+        for data in POSTS_DATA
+        for word in data["title"].split()
+        if len(word) > 4
+    }
+)
+
+
+class ASGIClient:
+    """Sends requests straight to an ASGI application, in process."""
+
+    def __init__(self, app, host: str):
+        self.app = app
+        self.host = host.encode()
+
+    async def request(
+        self, method: str, path: str, data=None, token: str | None = None
+    ) -> tuple[int, bytes]:
+        path, _, query = path.partition("?")
+        body = b"" if data is None else orjson.dumps(data)
+        headers = [(b"host", self.host), (b"content-length", str(len(body)).encode())]
+        if data is not None:
+            headers.append((b"content-type", b"application/json"))
+        if token is not None:
+            headers.append((b"authorization", f"Bearer {token}".encode()))
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": headers,
+            "client": ("127.0.0.1", 0),
+            "server": (self.host.decode(), 80),
+        }
+        sent = False
+        response = {"status": 500, "body": []}
+
+        async def receive():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            # The client stays connected, until the handler stops listening.
+            await asyncio.Event().wait()
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+
+        await self.app(scope, receive, send)
+        return response["status"], b"".join(response["body"])
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive a mixed workload of concurrent virtual authors through the ASGI "
+        "application and report latency percentiles and throughput per endpoint."
+    )
+    command_name = "load_test"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=20, help="Virtual authors.")
+        parser.add_argument("--duration", type=float, default=30, help="Seconds.")
+        parser.add_argument(
+            "--posts", type=int, default=5, help="Posts seeded per virtual author."
+        )
+        parser.add_argument(
+            "--burst", type=int, default=5, help="Concurrent comments per burst."
+        )
+        parser.add_argument("--seed", type=int, default=None, help="Random seed.")
+        baseline.add_arguments(parser, "p95")
+        parser.add_argument(
+            "--keep-data",
+            action="store_true",
+            help="Keep the virtual authors and what they wrote.",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Run even with DEBUG off, e.g. against a staging database.",
+        )
+
+    def handle(self, *args, **options):
+        if not (settings.DEBUG or options["force"]):
+            raise CommandError(
+                "load_test creates and deletes authors in the configured "
+                "database: run it with DEBUG on, or pass --force."
+            )
+        # Imported here, building the application needs the settings loaded.
+        from blog.asgi import application
+
+        hosts = [host.lstrip(".") for host in settings.ALLOWED_HOSTS if host != "*"]
+        self.client = ASGIClient(application, hosts[0] if hosts else "localhost")
+        self.random = random.Random(options["seed"])
+        self.burst = options["burst"]
+        self.timings: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+        authors = self._seed(options["users"], options["posts"])
+        try:
+            start = time.perf_counter()
+            async_to_sync(self._run)(authors, start + options["duration"])
+            elapsed = time.perf_counter() - start
+        finally:
+            if not options["keep_data"]:
+                self._delete()
+        results = self._results(elapsed)
+        self._report(results, elapsed)
+        baseline.check(
+            self, results, options, "p95", users=options["users"], duration=elapsed
+        )
+
+    def _seed(self, users: int, posts: int) -> list[models.Author]:
+        # Leftovers of an interrupted run.
+        self._delete()
+        password = make_password(PASSWORD)
+        authors = models.Author.objects.bulk_create(
+            models.Author(
+                username=f"{USERNAME_PREFIX}{i}",
+                email=f"{i}@{EMAIL_DOMAIN}",
+                first_name="Load",
+                last_name=f"Test {i}",
+                password=password,
+            )
+            for i in range(users)
+        )
+        # Saved one by one for the signals to fill the counters and feed.
+        for author in authors:
+            for data in self.random.sample(POSTS_DATA, min(posts, len(POSTS_DATA))):
+                models.Post.objects.create(author=author, **data)
+        return authors
+
+    def _delete(self):
+        models.Author.objects.filter(
+            username__startswith=USERNAME_PREFIX, email__endswith=f"@{EMAIL_DOMAIN}"
+        ).delete()
+
+    async def _run(self, authors: list[models.Author], deadline: float):
+        post_ids = [
+            str(pk)
+            async for pk in models.Post.objects.filter(author__in=authors).values_list(
+                "pk", flat=True
+            )
+        ]
+        outcomes = await asyncio.gather(
+            *(self._user(author, post_ids, deadline) for author in authors),
+            return_exceptions=True,
+        )
+        # A failing virtual user stops alone, the others finish the run.
+        self.failures = [
+            f"{author.username}: {outcome!r}"
+            for author, outcome in zip(authors, outcomes)
+            if isinstance(outcome, Exception)
+        ]
+
+    async def _call(self, name: str, method: str, path: str, data=None, token=None):
+        start = time.perf_counter()
+        status, body = await self.client.request(method, path, data, token)
+        self.timings[name].append((time.perf_counter() - start) * 1000)
+        if status >= 400:
+            self.errors[name] += 1
+            return None
+        return orjson.loads(body) if body else None
+
+    async def _login(self, author: models.Author) -> str | None:
+        data = await self._call(
+            "POST /api/login",
+            "POST",
+            "/api/login",
+            {"username": author.username, "password": PASSWORD},
+        )
+        return data and data["access_token"]
+
+    async def _user(self, author: models.Author, post_ids: list[str], deadline: float):
+        token = await self._login(author)
+        if token is None:
+            return
+        while time.perf_counter() < deadline:
+            # No comment bursts until there is a post to comment on.
+            actions = [name for name in WEIGHTS if post_ids or name != "comment_burst"]
+            weights = [WEIGHTS[name] for name in actions]
+            action = self.random.choices(actions, weights)[0]
+            if action == "login":
+                token = await self._login(author) or token
+            elif action == "feed":
+                await self._call(
+                    "GET /api/activities/by-me",
+                    "GET",
+                    "/api/activities/by-me?page_size=20",
+                    token=token,
+                )
+            elif action == "posts":
+                await self._call(
+                    "GET /api/posts", "GET", "/api/posts?page_size=20", token=token
+                )
+            elif action == "search":
+                query = urlencode({"q": self.random.choice(SEARCH_TERMS), "limit": 20})
+                await self._call(
+                    "GET /api/posts/search",
+                    "GET",
+                    f"/api/posts/search?{query}",
+                    token=token,
+                )
+            elif action == "create_post":
+                post = await self._call(
+                    "POST /api/posts",
+                    "POST",
+                    "/api/posts",
+                    self.random.choice(POSTS_DATA) | {"author_id": str(author.pk)},
+                    token,
+                )
+                if post is not None:
+                    post_ids.append(post["id"])
+            else:
+                post_id = self.random.choice(post_ids)
+                await asyncio.gather(
+                    *(
+                        self._call(
+                            "POST /api/comments",
+                            "POST",
+                            "/api/comments",
+                            {
+                                "post_id": post_id,
+                                "author_id": str(author.pk),
+                                "content": f"Load test comment {i}.",
+                            },
+                            token,
+                        )
+                        for i in range(self.burst)
+                    )
+                )
+
+    def _results(self, elapsed: float) -> dict[str, dict]:
+        results = {}
+        for name, timings in sorted(self.timings.items()):
+            if len(timings) > 1:
+                percentiles = statistics.quantiles(timings, n=100, method="inclusive")
+                p50, p95, p99 = percentiles[49], percentiles[94], percentiles[98]
+            else:
+                p50 = p95 = p99 = timings[0]
+            results[name] = {
+                "requests": len(timings),
+                "errors": self.errors[name],
+                "rps": round(len(timings) / elapsed, 2),
+                "p50": round(p50, 3),
+                "p95": round(p95, 3),
+                "p99": round(p99, 3),
+            }
+        return results
+
+    def _report(self, results: dict[str, dict], elapsed: float):
+        self.stdout.write(
+            f"{sum(row['requests'] for row in results.values())} requests "
+            f"in {elapsed:.1f} s"
+        )
+        self.stdout.write(
+            f"{'endpoint':<28} {'requests':>8} {'errors':>6} {'rps':>8} "
+            f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+        )
+        for name, row in results.items():
+            self.stdout.write(
+                f"{name:<28} {row['requests']:>8} {row['errors']:>6} "
+                f"{row['rps']:>8.2f} {row['p50']:>8.2f} {row['p95']:>8.2f} "
+                f"{row['p99']:>8.2f}"
+            )
+        for failure in self.failures:
+            self.stderr.write(f"Virtual user failed, {failure}")
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api import counters
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized post and author counters that drifted."
+    command_name = "reconcile_counters"
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        fixed = counters.reconcile_all()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Reconciled {fixed['posts']} posts and {fixed['authors']} authors "
+                f"in {time.perf_counter() - start:.1f}s."
+            )
+        )
@@ -0,0 +1,285 @@
+"""
+Per-request instrumentation: query count, database, auth, serialization,
+render and total time of every request, aggregated into per-route
+histograms served as Prometheus text on ``/metrics``.
+
+``MetricsMiddleware`` opens a ``RequestMetrics`` in a context variable, so
+it follows the request into ``sync_to_async`` threads. Queries are counted
+by a wrapper installed on every database connection; ``timed`` adds the
+time of a block, e.g. authentication, to the current request. The
+decorators ``instrument`` adds to the API time serialization, from the
+return of the view to the encoded response: schema validation,
+``model_dump`` and rendering.
+
+``/metrics`` only answers ``METRICS_ALLOWED_IPS`` and requests bearing
+``METRICS_TOKEN``.
+
+Queries slower than ``SLOW_QUERY_SECONDS`` are logged. Requests running
+more than ``QUERY_BUDGET`` queries are logged too, or raise
+``QueryBudgetExceeded`` with ``QUERY_BUDGET_RAISE``, e.g. in tests.
+"""
+
+import hmac
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpRequest, HttpResponse, HttpResponseForbidden
+
+logger = logging.getLogger(__name__)
+
+TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+# Name, help and buckets of each histogram, observed once per request.
+HISTOGRAMS = {
+    "request": ("Total request time in seconds.", TIME_BUCKETS),
+    "db": ("Time spent in database queries in seconds.", TIME_BUCKETS),
+    "auth": ("Time spent authenticating in seconds.", TIME_BUCKETS),
+    "serialize": (
+        "Time spent validating, dumping and rendering the response in seconds.",
+        TIME_BUCKETS,
+    ),
+    "render": ("Time spent encoding the response body in seconds.", TIME_BUCKETS),
+    "queries": ("Database queries run.", QUERY_BUCKETS),
+}
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class RequestMetrics:
+    __slots__ = ("queries", "db", "auth", "serialize", "render", "view_returned")
+
+    def __init__(self):
+        self.queries = 0
+        self.db = self.auth = self.serialize = self.render = 0.0
+        self.view_returned: float | None = None
+
+
+_current: ContextVar[RequestMetrics | None] = ContextVar("metrics", default=None)
+
+
+@contextmanager
+def timed(name: str):
+    """Add the time of the block to ``name`` of the current request."""
+    metrics = _current.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if metrics is not None:
+            elapsed = time.perf_counter() - start
+            setattr(metrics, name, getattr(metrics, name) + elapsed)
+
+
+def _record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        if metrics is not None:
+            metrics.queries += 1
+            metrics.db += elapsed
+        if elapsed > settings.SLOW_QUERY_SECONDS:
+            logger.warning("Slow query (%.3f s): %s", elapsed, sql)
+
+
+def install(connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+connection_created.connect(install)
+# Connections opened before this module was imported.
+for connection in connections.all(initialized_only=True):
+    install(connection)
+
+
+def _mark_view_returned(view_func):
+    # Operation decorator, runs just before ninja validates the result.
+    @wraps(view_func)
+    async def wrapper(*args, **kwargs):
+        result = await view_func(*args, **kwargs)
+        if (metrics := _current.get()) is not None:
+            metrics.view_returned = time.perf_counter()
+        return result
+
+    return wrapper if iscoroutinefunction(view_func) else view_func
+
+
+def _time_serialization(run):
+    # View decorator, wraps the whole operation: checks, view and response.
+    @wraps(run)
+    async def wrapper(*args, **kwargs):
+        response = await run(*args, **kwargs)
+        metrics = _current.get()
+        if metrics is not None and metrics.view_returned is not None:
+            metrics.serialize += time.perf_counter() - metrics.view_returned
+        return response
+
+    return wrapper if iscoroutinefunction(run) else run
+
+
+def instrument(api):
+    """Time the serialization of the views of ``api``, before adding routers."""
+    api.add_decorator(_mark_view_returned, mode="operation")
+    api.add_decorator(_time_serialization, mode="view")
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """Histograms per (method, route) and metric, for this process."""
+
+    def __init__(self):
+        self._histograms: dict[tuple[str, str], dict[str, Histogram]] = {}
+        self._lock = threading.Lock()
+
+    def observe(
+        self, method: str, route: str, total: float, metrics: RequestMetrics
+    ):
+        values = {
+            "request": total,
+            "db": metrics.db,
+            "auth": metrics.auth,
+            "serialize": metrics.serialize,
+            "render": metrics.render,
+            "queries": metrics.queries,
+        }
+        with self._lock:
+            histograms = self._histograms.get((method, route))
+            if histograms is None:
+                histograms = self._histograms[(method, route)] = {
+                    name: Histogram(buckets)
+                    for name, (_, buckets) in HISTOGRAMS.items()
+                }
+            for name, value in values.items():
+                histograms[name].observe(value)
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def export(self) -> str:
+        lines = []
+        with self._lock:
+            for name, (help_text, _) in HISTOGRAMS.items():
+                metric = f"api_{name}" if name == "queries" else f"api_{name}_seconds"
+                lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} histogram"]
+                for (method, route), histograms in sorted(self._histograms.items()):
+                    histogram = histograms[name]
+                    labels = f'method="{method}",route="{route}"'
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(
+                            f'{metric}_bucket{{{labels},le="{bound}"}} {cumulative}'
+                        )
+                    lines += [
+                        f'{metric}_bucket{{{labels},le="+Inf"}} {histogram.count}',
+                        f"{metric}_sum{{{labels}}} {histogram.sum}",
+                        f"{metric}_count{{{labels}}} {histogram.count}",
+                    ]
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+def _route(request: HttpRequest) -> str:
+    # The URL pattern, not the path, to keep the label set bounded.
+    match = request.resolver_match
+    return f"/{match.route}" if match is not None else "unmatched"
+
+
+class MetricsMiddleware:
+    """Record the metrics of every request but those of ``/metrics``."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics, token, start = self._start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._finish(request, metrics, start)
+        return response
+
+    async def __acall__(self, request):
+        metrics, token, start = self._start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._finish(request, metrics, start)
+        return response
+
+    def _start(self):
+        metrics = RequestMetrics()
+        return metrics, _current.set(metrics), time.perf_counter()
+
+    def _finish(self, request: HttpRequest, metrics: RequestMetrics, start: float):
+        route = _route(request)
+        if route == "/metrics":
+            return
+        registry.observe(request.method, route, time.perf_counter() - start, metrics)
+        budget = settings.QUERY_BUDGET
+        if budget is not None and metrics.queries > budget:
+            message = (
+                f"{request.method} {request.path} ran {metrics.queries} queries, "
+                f"over the budget of {budget}"
+            )
+            if settings.QUERY_BUDGET_RAISE:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+
+
+def _allowed(request: HttpRequest) -> bool:
+    if request.META.get("REMOTE_ADDR") in settings.METRICS_ALLOWED_IPS:
+        return True
+    token = settings.METRICS_TOKEN
+    header = request.headers.get("Authorization", "")
+    return bool(token) and hmac.compare_digest(header, f"Bearer {token}")
+
+
+def metrics_view(request: HttpRequest) -> HttpResponse:
+    if not _allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        registry.export(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -0,0 +1,68 @@
+from django.db import migrations
+
+# Frozen copy of the index of api.search at the time: an external-content
+# FTS5 table mirroring api_post by rowid. 0008 replaces it.
+INSTALL_SQL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS api_post_fts USING fts5(
+        title, content, content='api_post', content_rowid='rowid',
+        tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS api_post_fts_ai AFTER INSERT ON api_post BEGIN
+        INSERT INTO api_post_fts(rowid, title, content)
+        VALUES (new.rowid, new.title, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS api_post_fts_ad AFTER DELETE ON api_post BEGIN
+        INSERT INTO api_post_fts(api_post_fts, rowid, title, content)
+        VALUES ('delete', old.rowid, old.title, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS api_post_fts_au
+    AFTER UPDATE OF title, content ON api_post BEGIN
+        INSERT INTO api_post_fts(api_post_fts, rowid, title, content)
+        VALUES ('delete', old.rowid, old.title, old.content);
+        INSERT INTO api_post_fts(rowid, title, content)
+        VALUES (new.rowid, new.title, new.content);
+    END
+    """,
+    "INSERT INTO api_post_fts(api_post_fts) VALUES ('rebuild')",
+]
+
+UNINSTALL_SQL = [
+    "DROP TRIGGER IF EXISTS api_post_fts_ai",
+    "DROP TRIGGER IF EXISTS api_post_fts_ad",
+    "DROP TRIGGER IF EXISTS api_post_fts_au",
+    "DROP TABLE IF EXISTS api_post_fts",
+]
+
+
+def execute(schema_editor, statements):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def install(apps, schema_editor):
+    execute(schema_editor, INSTALL_SQL)
+
+
+def uninstall(apps, schema_editor):
+    execute(schema_editor, UNINSTALL_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_post_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['author', 'updated_at'], name='api_comment_author_upd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', 'updated_at'], name='api_post_author_upd_idx'),
+        ),
+    ]
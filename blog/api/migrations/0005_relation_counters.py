@@ -0,0 +1,110 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:34
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+# Frozen copy of the search index triggers of 0003, keyed on api_post rowids.
+SEARCH_INSTALL_SQL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS api_post_fts USING fts5(
+        title, content, content='api_post', content_rowid='rowid',
+        tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS api_post_fts_ai AFTER INSERT ON api_post BEGIN
+        INSERT INTO api_post_fts(rowid, title, content)
+        VALUES (new.rowid, new.title, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS api_post_fts_ad AFTER DELETE ON api_post BEGIN
+        INSERT INTO api_post_fts(api_post_fts, rowid, title, content)
+        VALUES ('delete', old.rowid, old.title, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS api_post_fts_au
+    AFTER UPDATE OF title, content ON api_post BEGIN
+        INSERT INTO api_post_fts(api_post_fts, rowid, title, content)
+        VALUES ('delete', old.rowid, old.title, old.content);
+        INSERT INTO api_post_fts(rowid, title, content)
+        VALUES (new.rowid, new.title, new.content);
+    END
+    """,
+    "INSERT INTO api_post_fts(api_post_fts) VALUES ('rebuild')",
+]
+
+
+def install_search(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for sql in SEARCH_INSTALL_SQL:
+            cursor.execute(sql)
+
+
+def count(model, field):
+    rows = (
+        model.objects.filter(**{field: OuterRef("pk")})
+        .order_by()
+        .values(field)
+        .annotate(n=Count("*"))
+        .values("n")
+    )
+    return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+
+def count_all(apps, schema_editor):
+    Post = apps.get_model("api", "Post")
+    Comment = apps.get_model("api", "Comment")
+    Post.objects.update(
+        comment_count=count(Comment, "post"),
+        tag_count=count(Post.tags.through, "post"),
+        category_count=count(Post.categories.through, "post"),
+    )
+    apps.get_model("api", "Author").objects.update(
+        post_count=count(Post, "author"),
+        comment_count=count(Comment, "author"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_author_updated_indexes'),
+    ]
+
+    operations = [
+        # SQLite remakes api_post below, dropping the search triggers, so
+        # they are reinstalled after it both ways.
+        migrations.RunPython(migrations.RunPython.noop, install_search),
+        migrations.AddField(
+            model_name='author',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='author',
+            name='post_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='category_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='tag_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(install_search, migrations.RunPython.noop),
+        migrations.RunPython(count_all, migrations.RunPython.noop),
+    ]
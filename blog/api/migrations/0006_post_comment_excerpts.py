@@ -0,0 +1,86 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:52
+
+from django.db import migrations, models
+from django.db.models import Case, F, TextField, Value, When
+from django.db.models.functions import Concat, Left, Length
+from django.db.models.lookups import GreaterThan
+
+# Frozen copy of the search index triggers of 0003, keyed on api_post rowids.
+SEARCH_INSTALL_SQL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS api_post_fts USING fts5(
+        title, content, content='api_post', content_rowid='rowid',
+        tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS api_post_fts_ai AFTER INSERT ON api_post BEGIN
+        INSERT INTO api_post_fts(rowid, title, content)
+        VALUES (new.rowid, new.title, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS api_post_fts_ad AFTER DELETE ON api_post BEGIN
+        INSERT INTO api_post_fts(api_post_fts, rowid, title, content)
+        VALUES ('delete', old.rowid, old.title, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS api_post_fts_au
+    AFTER UPDATE OF title, content ON api_post BEGIN
+        INSERT INTO api_post_fts(api_post_fts, rowid, title, content)
+        VALUES ('delete', old.rowid, old.title, old.content);
+        INSERT INTO api_post_fts(rowid, title, content)
+        VALUES (new.rowid, new.title, new.content);
+    END
+    """,
+    "INSERT INTO api_post_fts(api_post_fts) VALUES ('rebuild')",
+]
+
+
+def install_search(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for sql in SEARCH_INSTALL_SQL:
+            cursor.execute(sql)
+
+
+
+def fill_excerpts(apps, schema_editor):
+    # Frozen copy of api.excerpts.excerpt_expression: 200 characters at most.
+    excerpt = Case(
+        When(
+            GreaterThan(Length("content"), 200),
+            then=Concat(Left("content", 199), Value("…")),
+        ),
+        default=F("content"),
+        output_field=TextField(),
+    )
+    for name in ("Post", "Comment"):
+        apps.get_model("api", name).objects.update(excerpt=excerpt)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_relation_counters'),
+    ]
+
+    operations = [
+        # SQLite remakes api_post below, dropping the search triggers, so
+        # they are reinstalled after it both ways.
+        migrations.RunPython(migrations.RunPython.noop, install_search),
+        migrations.AddField(
+            model_name='comment',
+            name='excerpt',
+            field=models.CharField(blank=True, default='', editable=False, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.CharField(blank=True, default='', editable=False, max_length=200),
+        ),
+        migrations.RunPython(install_search, migrations.RunPython.noop),
+        migrations.RunPython(fill_excerpts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:14
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+def fill_feed(apps, schema_editor):
+    # Frozen copy of api.feed.fill_all: one entry per post and comment.
+    Activity = apps.get_model("api", "Activity")
+    for name in ("Post", "Comment"):
+        kind = name.lower()
+        queryset = apps.get_model("api", name).objects.defer("content")
+        entries = []
+        for obj in queryset.iterator(chunk_size=5000):
+            entries.append(
+                Activity(
+                    id=obj.pk,
+                    created_at=obj.created_at,
+                    author_id=obj.author_id,
+                    kind=kind,
+                    post_id=obj.pk if kind == "post" else obj.post_id,
+                    comment_id=obj.pk if kind == "comment" else None,
+                    title=getattr(obj, "title", ""),
+                    excerpt=obj.excerpt,
+                )
+            )
+            if len(entries) == 5000:
+                Activity.objects.bulk_create(entries)
+                entries = []
+        Activity.objects.bulk_create(entries)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_post_comment_excerpts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Activity',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('created_at', models.DateTimeField()),
+                ('kind', models.CharField(choices=[('post', 'post'), ('comment', 'comment')], max_length=10)),
+                ('title', models.CharField(blank=True, default='', max_length=200)),
+                ('excerpt', models.CharField(blank=True, default='', max_length=200)),
+                ('author', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='%(class)ss', to='api.author')),
+                ('comment', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.comment')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.post')),
+            ],
+            options={
+                'verbose_name_plural': 'activities',
+                'ordering': ['-created_at', '-id'],
+                'abstract': False,
+                'indexes': [models.Index(fields=['created_at', 'id'], name='api_activity_created_idx'), models.Index(fields=['author', 'created_at', 'id'], name='api_activity_author_idx'), models.Index(fields=['author', 'updated_at'], name='api_activity_author_upd_idx')],
+            },
+        ),
+        migrations.RunPython(fill_feed, migrations.RunPython.noop),
+    ]
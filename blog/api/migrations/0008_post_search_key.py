@@ -0,0 +1,126 @@
+from django.db import migrations
+
+# Frozen copy of the index of api.search at the time: a contentless FTS5
+# table whose rowids come from a key table, as the rowids of api_post are
+# renumbered by VACUUM and table remakes.
+INSTALL_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS api_post_fts_key (
+        id INTEGER PRIMARY KEY, post_id char(32) NOT NULL UNIQUE
+    )
+    """,
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS api_post_fts USING fts5(
+        title, content, content='', tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS api_post_fts_ai AFTER INSERT ON api_post BEGIN
+        INSERT INTO api_post_fts_key(post_id) VALUES (new.id);
+        INSERT INTO api_post_fts(rowid, title, content)
+        VALUES (
+            (SELECT id FROM api_post_fts_key WHERE post_id = new.id),
+            new.title, new.content
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS api_post_fts_ad AFTER DELETE ON api_post BEGIN
+        INSERT INTO api_post_fts(api_post_fts, rowid, title, content)
+        VALUES (
+            'delete', (SELECT id FROM api_post_fts_key WHERE post_id = old.id),
+            old.title, old.content
+        );
+        DELETE FROM api_post_fts_key WHERE post_id = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS api_post_fts_au
+    AFTER UPDATE OF title, content ON api_post BEGIN
+        INSERT INTO api_post_fts(api_post_fts, rowid, title, content)
+        VALUES (
+            'delete', (SELECT id FROM api_post_fts_key WHERE post_id = old.id),
+            old.title, old.content
+        );
+        INSERT INTO api_post_fts(rowid, title, content)
+        VALUES (
+            (SELECT id FROM api_post_fts_key WHERE post_id = new.id),
+            new.title, new.content
+        );
+    END
+    """,
+    "INSERT INTO api_post_fts_key(post_id) SELECT id FROM api_post",
+    """
+    INSERT INTO api_post_fts(rowid, title, content)
+    SELECT api_post_fts_key.id, api_post.title, api_post.content
+    FROM api_post_fts_key JOIN api_post ON api_post.id = api_post_fts_key.post_id
+    """,
+]
+
+UNINSTALL_SQL = [
+    "DROP TRIGGER IF EXISTS api_post_fts_ai",
+    "DROP TRIGGER IF EXISTS api_post_fts_ad",
+    "DROP TRIGGER IF EXISTS api_post_fts_au",
+    "DROP TABLE IF EXISTS api_post_fts",
+    "DROP TABLE IF EXISTS api_post_fts_key",
+]
+
+# The index of 0003, keyed on api_post rowids, to migrate backwards.
+ROWID_INSTALL_SQL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS api_post_fts USING fts5(
+        title, content, content='api_post', content_rowid='rowid',
+        tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS api_post_fts_ai AFTER INSERT ON api_post BEGIN
+        INSERT INTO api_post_fts(rowid, title, content)
+        VALUES (new.rowid, new.title, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS api_post_fts_ad AFTER DELETE ON api_post BEGIN
+        INSERT INTO api_post_fts(api_post_fts, rowid, title, content)
+        VALUES ('delete', old.rowid, old.title, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS api_post_fts_au
+    AFTER UPDATE OF title, content ON api_post BEGIN
+        INSERT INTO api_post_fts(api_post_fts, rowid, title, content)
+        VALUES ('delete', old.rowid, old.title, old.content);
+        INSERT INTO api_post_fts(rowid, title, content)
+        VALUES (new.rowid, new.title, new.content);
+    END
+    """,
+    "INSERT INTO api_post_fts(api_post_fts) VALUES ('rebuild')",
+]
+
+
+def execute(schema_editor, statements):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def key_index(apps, schema_editor):
+    execute(schema_editor, UNINSTALL_SQL + INSTALL_SQL)
+
+
+def rowid_index(apps, schema_editor):
+    execute(schema_editor, UNINSTALL_SQL + ROWID_INSTALL_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_activity_feed'),
+    ]
+
+    operations = [
+        # Replaces the index keyed on api_post rowids by the key table.
+        migrations.RunPython(key_index, rowid_index),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_post_search_key'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='activity',
+            name='author',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='activities', to='api.author'),
+        ),
+    ]
@@ -5,9 +5,17 @@ from ninja_aio.exceptions import NotFoundError, AuthError
 from django.db import models
 from django.http import HttpRequest
 from django.conf import settings
-from django.contrib.auth.hashers import make_password, acheck_password
+from django.contrib.auth.hashers import make_password, identify_hasher
 from ninja_aio.auth import encode_jwt
 
+from api import sparse
+from api.excerpts import EXCERPT_LENGTH, make_excerpt
+from api.hashing import acheck_password
+
+
+# Generated schemas, see Base._generate_model_schema.
+_schemas: dict[tuple, type | None] = {}
+
 
 class AuthorAuthenticatedRequest(HttpRequest):
     author: "Author"
@@ -20,18 +28,113 @@ class Base(ModelSerializer):
 
     class Meta:
         abstract = True
+        # Matches the (created_at, id) keyset used by api.pagination.
+        ordering = ["-created_at", "-id"]
+        indexes = [
+            models.Index(
+                fields=["created_at", "id"], name="%(app_label)s_%(class)s_created_idx"
+            ),
+        ]
+
+    # Maintained with F() updates by api.counters, so save() on a stale
+    # instance must not write them back.
+    counter_fields: tuple[str, ...] = ()
+    # Text field summarized into the excerpt field on save, see api.excerpts.
+    excerpt_source: str | None = None
 
     class ReadSerialzer:
         fields = ["id", "created_at", "updated_at"]
 
+    def update_excerpt(self):
+        """Recompute the excerpt. Done by save(), call it before bulk writes."""
+        if self.excerpt_source is not None:
+            self.excerpt = make_excerpt(getattr(self, self.excerpt_source))
+
+    def save(self, *args, **kwargs):
+        self.update_excerpt()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and self.excerpt_source in update_fields:
+            kwargs["update_fields"] = {*update_fields, "excerpt"}
+        if (
+            self.counter_fields
+            and not self._state.adding
+            and kwargs.get("update_fields") is None
+        ):
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def _generate_model_schema(cls, schema_type, depth=None):
+        # Every generate_*_s() goes through here and ninja_aio rebuilds the
+        # schema on each call, so keep one per model, kind and depth.
+        key = (cls, schema_type, depth)
+        if key not in _schemas:
+            _schemas[key] = super()._generate_model_schema(schema_type, depth)
+        return _schemas[key]
+
+    @classmethod
+    def get_related_schema_data(cls):
+        # Nested in other objects, e.g. the post of a comment, the excerpt
+        # stands in for the full text.
+        fields, customs = super().get_related_schema_data()
+        if fields and cls.excerpt_source is not None:
+            fields = [name for name in fields if name != cls.excerpt_source]
+        return fields, customs
+
+    @classmethod
+    def build_schemas(cls) -> list:
+        """
+        Generate every schema of the model, fully built so that errors and
+        build time show at startup rather than on the first request.
+        """
+        schemas = [
+            cls.generate_read_s(),
+            cls.generate_create_s(),
+            cls.generate_update_s(),
+            cls.generate_related_s(),
+        ]
+        for schema in filter(None, schemas):
+            schema.model_json_schema()
+        return schemas
+
+    @classmethod
+    async def queryset_request(cls, request: HttpRequest):
+        # ModelUtil swaps its read-optimized queryset for this one, so join
+        # the relations declared in ReadSerializer here to avoid N+1 queries.
+        queryset = (await super().queryset_request(request)).prefetch_related(
+            *cls.util.get_reverse_relations()
+        )
+        if relateds := cls.util.get_select_relateds():
+            # select_related() without arguments would follow every foreign key.
+            queryset = queryset.select_related(*relateds)
+        if (fields := getattr(request, "sparse_fields", None)) is not None:
+            queryset = sparse.narrow(queryset, fields)
+        return queryset
+
 
 class BaseAuthorRelated(Base):
+    # Covered by the composite author index below.
     author = models.ForeignKey(
-        "Author", on_delete=models.CASCADE, related_name="%(class)ss"
+        "Author", on_delete=models.CASCADE, related_name="%(class)ss", db_index=False
     )
 
-    class Meta:
+    class Meta(Base.Meta):
         abstract = True
+        indexes = Base.Meta.indexes + [
+            models.Index(
+                fields=["author", "created_at", "id"],
+                name="%(app_label)s_%(class)s_author_idx",
+            ),
+            # Covers the MAX(updated_at)/COUNT(*) validators of api.conditional.
+            models.Index(
+                fields=["author", "updated_at"],
+                name="%(app_label)s_%(class)s_author_upd_idx",
+            ),
+        ]
 
     class ReadSerializer:
         fields = Base.ReadSerialzer.fields + [
@@ -53,7 +156,7 @@ class BasePostRelated(Base):
         "Post", related_name="%(class)ss"
     )
 
-    class Meta:
+    class Meta(Base.Meta):
         abstract = True
 
 
@@ -63,6 +166,10 @@ class Author(Base):
     username = models.CharField(max_length=100, unique=True)
     email = models.EmailField(unique=True)
     password = models.CharField(max_length=128)
+    # Maintained by api.signals, see api.counters.
+    post_count = models.PositiveIntegerField(default=0, editable=False)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    counter_fields = ("post_count", "comment_count")
 
     @property
     def full_name(self):
@@ -72,6 +179,8 @@ class Author(Base):
         fields = Base.ReadSerialzer.fields + [
             "username",
             "email",
+            "post_count",
+            "comment_count",
         ]
         customs = [("full_name", str, "")]
 
@@ -129,8 +238,17 @@ class Author(Base):
     def create_jwt_tokens(self) -> tuple[str, str]:
         return self.create_access_token(), self.create_refresh_token()
 
+    def password_is_hashed(self) -> bool:
+        try:
+            identify_hasher(self.password)
+        except ValueError:
+            return False
+        return True
+
     def on_create_before_save(self):
-        self.password = make_password(self.password)
+        # API signups hash in the worker pool beforehand, see api.hashing.
+        if not self.password_is_hashed():
+            self.password = make_password(self.password)
 
     def __str__(self):
         return f"{self.username}@{self.email}"
@@ -139,11 +257,24 @@ class Author(Base):
 class Post(BaseAuthorRelated):
     title = models.CharField(max_length=200)
     content = models.TextField()
+    excerpt = models.CharField(
+        max_length=EXCERPT_LENGTH, blank=True, default="", editable=False
+    )
+    excerpt_source = "content"
+    # Maintained by api.signals, see api.counters.
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    tag_count = models.PositiveIntegerField(default=0, editable=False)
+    category_count = models.PositiveIntegerField(default=0, editable=False)
+    counter_fields = ("comment_count", "tag_count", "category_count")
 
     class ReadSerializer:
         fields = BaseAuthorRelated.ReadSerializer.fields + [
             "title",
             "content",
+            "excerpt",
+            "comment_count",
+            "tag_count",
+            "category_count",
         ]
 
     class CreateSerializer:
@@ -152,18 +283,39 @@ class Post(BaseAuthorRelated):
             "content",
         ]
 
+    class UpdateSerializer:
+        optionals = [
+            ("title", str),
+            ("content", str),
+        ]
+
     def __str__(self):
         return f"{self.title} by {self.author.username}"
 
 
 class Comment(BaseAuthorRelated):
-    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="comments")
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE, related_name="comments", db_index=False
+    )
     content = models.TextField()
+    excerpt = models.CharField(
+        max_length=EXCERPT_LENGTH, blank=True, default="", editable=False
+    )
+    excerpt_source = "content"
+
+    class Meta(BaseAuthorRelated.Meta):
+        indexes = BaseAuthorRelated.Meta.indexes + [
+            models.Index(
+                fields=["post", "created_at", "id"],
+                name="%(app_label)s_%(class)s_post_idx",
+            ),
+        ]
 
     class ReadSerializer:
         fields = BaseAuthorRelated.ReadSerializer.fields + [
             "post",
             "content",
+            "excerpt",
         ]
 
     class CreateSerializer:
@@ -172,6 +324,11 @@ class Comment(BaseAuthorRelated):
             "content",
         ]
 
+    class UpdateSerializer:
+        optionals = [
+            ("content", str),
+        ]
+
     def __str__(self):
         return f"Comment by {self.author.username} on {self.post.title}"
 
@@ -189,6 +346,11 @@ class Tag(BasePostRelated):
             "name",
         ]
 
+    class UpdateSerializer:
+        optionals = [
+            ("name", str),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -209,8 +371,53 @@ class Category(BasePostRelated):
             "name",
         ]
 
-    class Meta:
+    class UpdateSerializer:
+        optionals = [
+            ("name", str),
+        ]
+
+    class Meta(BasePostRelated.Meta):
         verbose_name_plural = "categories"
 
     def __str__(self):
         return self.name
+
+
+class Activity(BaseAuthorRelated):
+    """
+    Feed entry of a post or comment of the author, sharing its id and
+    creation time. Maintained by api.feed.
+    """
+
+    author = models.ForeignKey(
+        "Author", on_delete=models.CASCADE, related_name="activities", db_index=False
+    )
+    created_at = models.DateTimeField()
+    kind = models.CharField(
+        max_length=10, choices=[("post", "post"), ("comment", "comment")]
+    )
+    # The post itself or the one commented on.
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="+")
+    comment = models.ForeignKey(
+        Comment, on_delete=models.CASCADE, null=True, related_name="+"
+    )
+    title = models.CharField(max_length=200, blank=True, default="")
+    excerpt = models.CharField(max_length=EXCERPT_LENGTH, blank=True, default="")
+
+    class ReadSerializer:
+        # Ids rather than the related objects, to read the feed alone.
+        fields = Base.ReadSerialzer.fields + [
+            "kind",
+            "title",
+            "excerpt",
+        ]
+        customs = [
+            ("post_id", uuid.UUID, ...),
+            ("comment_id", uuid.UUID | None, None),
+        ]
+
+    class Meta(BaseAuthorRelated.Meta):
+        verbose_name_plural = "activities"
+
+    def __str__(self):
+        return f"{self.kind} {self.pk} by {self.author_id}"
@@ -0,0 +1,133 @@
+import base64
+import datetime
+import uuid
+from typing import Any, List, Optional
+
+import orjson
+from django.db.models import Q, QuerySet
+from django.http import HttpRequest
+from ninja import Field, Schema
+from ninja.conf import settings
+from ninja.pagination import AsyncPaginationBase
+from ninja_aio.exceptions import SerializeError
+
+
+class CursorPagination(AsyncPaginationBase):
+    """
+    Keyset pagination on ``(created_at, id)``, newest first.
+
+    The cursor is an opaque token encoding the key of the last item of the
+    previous page, so every page is a single indexed range scan: no COUNT
+    and no OFFSET, whatever the page depth.
+    """
+
+    ordering = ("-created_at", "-id")
+
+    class Input(Schema):
+        cursor: Optional[str] = None
+        page_size: Optional[int] = Field(None, ge=1)
+
+    class Output(Schema):
+        items: List[Any]
+        next: Optional[str] = None
+
+    def __init__(
+        self,
+        page_size: int = settings.PAGINATION_PER_PAGE,
+        max_page_size: int = settings.PAGINATION_MAX_PER_PAGE_SIZE,
+        **kwargs: Any,
+    ) -> None:
+        self.page_size = page_size
+        self.max_page_size = max_page_size
+        super().__init__(**kwargs)
+
+    def _get_page_size(self, requested_page_size: Optional[int]) -> int:
+        if requested_page_size is None:
+            return self.page_size
+        return min(requested_page_size, self.max_page_size)
+
+    @staticmethod
+    def encode_cursor(created_at: datetime.datetime, pk: Any) -> str:
+        payload = orjson.dumps([created_at.isoformat(), str(pk)])
+        return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> tuple[datetime.datetime, str]:
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            created_at, pk = orjson.loads(base64.urlsafe_b64decode(padded))
+            # Every paginated model has a UUID primary key.
+            return datetime.datetime.fromisoformat(created_at), str(uuid.UUID(pk))
+        except (AttributeError, ValueError, TypeError):
+            raise SerializeError({"cursor": "invalid cursor"}, 400)
+
+    @staticmethod
+    def _item_key(item) -> tuple[datetime.datetime, str]:
+        if isinstance(item, dict):
+            created_at, pk = item["created_at"], item["id"]
+        else:
+            created_at, pk = item.created_at, item.pk
+        if isinstance(created_at, str):
+            created_at = datetime.datetime.fromisoformat(created_at)
+        return created_at, str(pk)
+
+    def _paginate_list(self, items: list, cursor, page_size: int) -> list:
+        # Already serialized collections, e.g. the M2M relation endpoints.
+        items = sorted(items, key=self._item_key, reverse=True)
+        if cursor is not None:
+            items = [item for item in items if self._item_key(item) < cursor]
+        return items[: page_size + 1]
+
+    def _cursor(self, pagination: Input):
+        if pagination.cursor is None:
+            return None
+        return self.decode_cursor(pagination.cursor)
+
+    def _page_queryset(self, queryset: QuerySet, cursor, page_size: int) -> QuerySet:
+        # One row more than the page tells whether there is a next one.
+        queryset = queryset.order_by(*self.ordering)
+        if cursor is not None:
+            created_at, pk = cursor
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk)
+            )
+        return queryset[: page_size + 1]
+
+    def _page(self, items: list, page_size: int) -> dict:
+        next_cursor = None
+        if len(items) > page_size:
+            items = items[:page_size]
+            next_cursor = self.encode_cursor(*self._item_key(items[-1]))
+        return {self.items_attribute: items, "next": next_cursor}
+
+    def paginate_queryset(
+        self,
+        queryset: QuerySet | list,
+        pagination: Input,
+        request: HttpRequest,
+        **params: Any,
+    ) -> Any:
+        page_size = self._get_page_size(pagination.page_size)
+        cursor = self._cursor(pagination)
+        if isinstance(queryset, QuerySet):
+            items = list(self._page_queryset(queryset, cursor, page_size))
+        else:
+            items = self._paginate_list(list(queryset), cursor, page_size)
+        return self._page(items, page_size)
+
+    async def apaginate_queryset(
+        self,
+        queryset: QuerySet | list,
+        pagination: Input,
+        request: HttpRequest,
+        **params: Any,
+    ) -> Any:
+        page_size = self._get_page_size(pagination.page_size)
+        cursor = self._cursor(pagination)
+        if isinstance(queryset, QuerySet):
+            items = [
+                obj async for obj in self._page_queryset(queryset, cursor, page_size)
+            ]
+        else:
+            items = self._paginate_list(list(queryset), cursor, page_size)
+        return self._page(items, page_size)
@@ -0,0 +1,31 @@
+import base64
+from ipaddress import IPv4Address, IPv6Address
+
+import orjson
+from ninja_aio import renders
+
+from api.metrics import timed
+
+
+def _default(value):
+    # Only called for types orjson can't encode itself, UUIDs and datetimes
+    # from model_dump() never get here.
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode()
+    if isinstance(value, (IPv4Address, IPv6Address)):
+        return str(value)
+    raise TypeError
+
+
+class ORJSONRenderer(renders.ORJSONRenderer):
+    """
+    NinjaAIO renderer encoding in a single ``orjson.dumps`` call.
+
+    The base class walks every value of the response in Python to convert
+    bytes and IP addresses before encoding, which costs far more than the
+    encoding itself on list pages. Those go through ``default`` instead.
+    """
+
+    def render(self, request, data, *, response_status):
+        with timed("render"):
+            return orjson.dumps(data, default=_default, option=self.option)
@@ -0,0 +1,225 @@
+"""
+Cache of rendered GET responses.
+
+Views opt in with ``cache_response``: it runs after authentication and
+serves hits as stored bytes (or a 304), while on a miss it tags the request
+so ``ResponseCacheMiddleware`` stores the body Ninja rendered.
+
+Keys embed a version token per model the response depends on. Writes
+replace the token (see ``api.signals``), which orphans every dependent entry
+at once without scanning the cache; orphans age out through the TTL or LRU.
+"""
+
+import hashlib
+import itertools
+import uuid
+from functools import wraps
+from typing import Iterable
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Model
+from django.http import HttpRequest, HttpResponse
+from django.utils.cache import get_conditional_response, set_response_etag
+from django.utils.http import parse_http_date_safe, urlencode
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.module_loading import import_string
+
+from api.cache import TTLCache
+
+
+class LocalBackend:
+    """Per-process LRU, each worker caches and invalidates on its own."""
+
+    def __init__(self, maxsize: int = 1024):
+        self.entries = TTLCache(maxsize=maxsize, ttl=settings.RESPONSE_CACHE_TTL)
+        self.versions: dict[str, int] = {}
+        self._counter = itertools.count(1)
+
+    async def aget(self, key: str):
+        return self.entries.get(key)
+
+    def set(self, key: str, entry: dict, ttl: float):
+        self.entries.set(key, entry, ttl)
+
+    async def aget_versions(self, labels: Iterable[str]) -> dict:
+        return {label: self.versions.get(label, 0) for label in labels}
+
+    def bump(self, label: str):
+        self.versions[label] = next(self._counter)
+
+    async def abump(self, label: str):
+        self.bump(label)
+
+    def clear(self):
+        self.entries.clear()
+        self.versions.clear()
+
+    def stats(self) -> dict:
+        return self.entries.stats()
+
+
+class DjangoCacheBackend:
+    """
+    Entries and versions in a Django cache shared by every worker, e.g.
+    Redis or Memcached. With the default ``LocMemCache`` it stands in for
+    one in development.
+
+    Lookups happen in async views and go through the cache's async API, as
+    do the invalidations of async views. Other writes come from signals and
+    middleware running in sync code.
+    """
+
+    version_prefix = "response-version:"
+
+    def __init__(self, alias: str = "default"):
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    async def aget(self, key: str):
+        return await self.cache.aget(key)
+
+    def set(self, key: str, entry: dict, ttl: float):
+        self.cache.set(key, entry, ttl)
+
+    async def aget_versions(self, labels: Iterable[str]) -> dict:
+        keys = {f"{self.version_prefix}{label}": label for label in labels}
+        found = await self.cache.aget_many(keys)
+        versions = {}
+        for key, label in keys.items():
+            if key not in found:
+                # Random rather than 0: an evicted version must not revive
+                # entries stored under an older one.
+                await self.cache.aadd(key, uuid.uuid4().hex, None)
+                found[key] = await self.cache.aget(key)
+            versions[label] = found[key]
+        return versions
+
+    def bump(self, label: str):
+        self.cache.set(f"{self.version_prefix}{label}", uuid.uuid4().hex, None)
+
+    async def abump(self, label: str):
+        await self.cache.aset(f"{self.version_prefix}{label}", uuid.uuid4().hex, None)
+
+    def clear(self):
+        self.cache.clear()
+
+    def stats(self) -> dict:
+        return {}
+
+
+class ResponseCache:
+    def __init__(self, backend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+
+    @staticmethod
+    def label(model: type[Model]) -> str:
+        return model._meta.label_lower
+
+    async def amake_key(
+        self, request: HttpRequest, labels: Iterable[str], scope: str
+    ) -> str:
+        versions = await self.backend.aget_versions(sorted(labels))
+        query = urlencode(sorted(request.GET.lists()), doseq=True)
+        raw = "|".join(
+            [
+                scope,
+                request.path,
+                query,
+                *(f"{label}={version}" for label, version in versions.items()),
+            ]
+        )
+        return f"response:{hashlib.sha256(raw.encode()).hexdigest()}"
+
+    async def aget(self, key: str):
+        return await self.backend.aget(key)
+
+    def store(self, key: str, response: HttpResponse):
+        # Views with validators (see api.conditional) already set an ETag.
+        if not response.has_header("ETag"):
+            set_response_etag(response)
+        self.backend.set(
+            key,
+            {
+                "content": response.content,
+                "headers": {
+                    header: response.headers[header]
+                    for header in ("Content-Type", "ETag", "Last-Modified")
+                    if response.has_header(header)
+                },
+            },
+            self.ttl,
+        )
+
+    def invalidate(self, *models: type[Model]):
+        for model in models:
+            self.backend.bump(self.label(model))
+
+    async def ainvalidate(self, *models: type[Model]):
+        for model in models:
+            await self.backend.abump(self.label(model))
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self) -> dict:
+        return self.backend.stats()
+
+
+def _get_backend():
+    backend = import_string(settings.RESPONSE_CACHE_BACKEND)
+    return backend(**settings.RESPONSE_CACHE_OPTIONS)
+
+
+response_cache = ResponseCache(_get_backend(), ttl=settings.RESPONSE_CACHE_TTL)
+
+
+def _conditional_response(request: HttpRequest, response: HttpResponse):
+    last_modified = response.headers.get("Last-Modified")
+    return get_conditional_response(
+        request,
+        etag=response.headers["ETag"],
+        last_modified=last_modified and parse_http_date_safe(last_modified),
+        response=response,
+    )
+
+
+def cache_response(labels: Iterable[str], per_author: bool = False):
+    """
+    View decorator serving cached responses. ``labels`` are the models the
+    response is built from; ``per_author`` keys entries by the authenticated
+    author for views whose queryset is scoped to them.
+    """
+    labels = frozenset(labels)
+
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(request, *args, **kwargs):
+            scope = str(request.author.pk) if per_author else "public"
+            key = await response_cache.amake_key(request, labels, scope)
+            entry = await response_cache.aget(key)
+            if entry is not None:
+                response = HttpResponse(entry["content"], headers=entry["headers"])
+                return _conditional_response(request, response)
+            result = await func(request, *args, **kwargs)
+            request.response_cache_key = key
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+class ResponseCacheMiddleware(MiddlewareMixin):
+    """Store responses of ``cache_response`` misses once rendered."""
+
+    def process_response(self, request, response):
+        key = getattr(request, "response_cache_key", None)
+        if key is None or response.status_code != 200 or response.streaming:
+            return response
+        response_cache.store(key, response)
+        return _conditional_response(request, response)
@@ -1,4 +1,11 @@
-from ninja import Schema
+from typing import Any, Literal
+from uuid import UUID
+
+from django.conf import settings
+from ninja import Field, Schema
+
+from api import models
+from api.sparse import sparse_schema
 
 
 class LoginSchemaIn(Schema):
@@ -17,4 +24,116 @@ class RefeshSchemaOut(Schema):
 
 class ChangePasswordSchemaIn(Schema):
     old_password: str
-    new_password: str
\ No newline at end of file
+    new_password: str
+
+
+class PostSearchSchemaIn(Schema):
+    q: str = Field(..., min_length=1)
+    limit: int = Field(20, ge=1, le=100)
+    offset: int = Field(0, ge=0)
+
+
+class ExportSchemaIn(Schema):
+    format: Literal["ndjson", "csv"] = "ndjson"
+
+
+class BatchSchemaIn(Schema):
+    items: list[dict[str, Any]] = Field(
+        ..., min_length=1, max_length=settings.BATCH_MAX_SIZE
+    )
+
+
+class BatchDeleteSchemaIn(Schema):
+    ids: list[UUID] = Field(..., min_length=1, max_length=settings.BATCH_MAX_SIZE)
+
+
+class BatchResultsSchema(Schema):
+    count: int
+    details: list[str]
+
+
+class BatchItemErrorSchema(Schema):
+    index: int
+    errors: dict[str, str]
+
+
+class BatchErrorsSchema(Schema):
+    count: int
+    details: list[BatchItemErrorSchema]
+
+
+class BatchSchemaOut(Schema):
+    results: BatchResultsSchema
+    errors: BatchErrorsSchema
+
+
+class PostRelationsBulkSchemaIn(Schema):
+    post_ids: list[UUID] = Field(..., min_length=1, max_length=settings.BATCH_MAX_SIZE)
+    action: Literal["attach", "detach"]
+
+
+class PostTagsBulkSchemaIn(PostRelationsBulkSchemaIn):
+    tag_ids: list[UUID] = Field(..., min_length=1, max_length=settings.BATCH_MAX_SIZE)
+
+
+class PostCategoriesBulkSchemaIn(PostRelationsBulkSchemaIn):
+    category_ids: list[UUID] = Field(
+        ..., min_length=1, max_length=settings.BATCH_MAX_SIZE
+    )
+
+
+class RelationsBulkSchemaOut(Schema):
+    changed: int
+    unchanged: int
+    not_found: dict[str, list[str]]
+
+
+class ImportSchemaIn(Schema):
+    batch_size: int = Field(settings.IMPORT_BATCH_SIZE, ge=1, le=10_000)
+
+
+class ImportBatchSchema(Schema):
+    index: int
+    lines: int
+    created: int
+    seconds: float
+
+
+class ImportLineErrorSchema(Schema):
+    line: int
+    errors: dict[str, str]
+
+
+class ImportErrorsSchema(Schema):
+    count: int
+    details: list[ImportLineErrorSchema]
+
+
+class ImportSchemaOut(Schema):
+    lines: int
+    created: dict[str, int]
+    batches: list[ImportBatchSchema]
+    errors: ImportErrorsSchema
+
+
+class TaxonomyCountSchema(Schema):
+    name: str
+    posts: int
+
+
+class PostDetailSchemaIn(Schema):
+    comments: int = Field(10, ge=0, le=100)
+
+
+class PostDetailSchemaOut(Schema):
+    post: models.Post.generate_read_s()
+    tags: list[models.Tag.generate_read_s()]
+    categories: list[models.Category.generate_read_s()]
+    # Without the post, already there.
+    comments: list[
+        sparse_schema(
+            models.Comment.generate_read_s(),
+            ("id", "created_at", "updated_at", "author", "content"),
+            "Detail",
+        )
+    ]
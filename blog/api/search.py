@@ -0,0 +1,167 @@
+"""
+Full-text search over posts.
+
+On SQLite posts are indexed in a contentless FTS5 table kept in sync by
+triggers, so bulk inserts and queryset updates are indexed too. Its rowids
+come from a key table mapping each post id to an integer of its own: the
+implicit rowid of ``api_post`` is renumbered by ``VACUUM`` and by the table
+remakes of SQLite migrations, these keys are not. SQLite drops triggers
+when it remakes a table, hence migrations altering ``Post`` must call
+``install`` again. Other backends fall back to ``icontains`` matching.
+"""
+
+import re
+
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.db.models import Q, QuerySet
+
+FTS_TABLE = "api_post_fts"
+KEY_TABLE = "api_post_fts_key"
+POST_TABLE = "api_post"
+
+_KEY_OF = f"(SELECT id FROM {KEY_TABLE} WHERE post_id = {{row}}.id)"
+
+INSTALL_SQL = [
+    f"""
+    CREATE TABLE IF NOT EXISTS {KEY_TABLE} (
+        id INTEGER PRIMARY KEY, post_id char(32) NOT NULL UNIQUE
+    )
+    """,
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, content, content='', tokenize='porter unicode61'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {POST_TABLE} BEGIN
+        INSERT INTO {KEY_TABLE}(post_id) VALUES (new.id);
+        INSERT INTO {FTS_TABLE}(rowid, title, content)
+        VALUES ({_KEY_OF.format(row="new")}, new.title, new.content);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {POST_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, content)
+        VALUES ('delete', {_KEY_OF.format(row="old")}, old.title, old.content);
+        DELETE FROM {KEY_TABLE} WHERE post_id = old.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au
+    AFTER UPDATE OF title, content ON {POST_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, content)
+        VALUES ('delete', {_KEY_OF.format(row="old")}, old.title, old.content);
+        INSERT INTO {FTS_TABLE}(rowid, title, content)
+        VALUES ({_KEY_OF.format(row="new")}, new.title, new.content);
+    END
+    """,
+    # Rebuild, posts may have changed while the triggers were missing.
+    f"DELETE FROM {KEY_TABLE} WHERE post_id NOT IN (SELECT id FROM {POST_TABLE})",
+    f"""
+    INSERT INTO {KEY_TABLE}(post_id)
+    SELECT id FROM {POST_TABLE} WHERE id NOT IN (SELECT post_id FROM {KEY_TABLE})
+    """,
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('delete-all')",
+    f"""
+    INSERT INTO {FTS_TABLE}(rowid, title, content)
+    SELECT {KEY_TABLE}.id, {POST_TABLE}.title, {POST_TABLE}.content
+    FROM {KEY_TABLE} JOIN {POST_TABLE} ON {POST_TABLE}.id = {KEY_TABLE}.post_id
+    """,
+]
+
+UNINSTALL_SQL = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+    f"DROP TABLE IF EXISTS {KEY_TABLE}",
+]
+
+SEARCH_SQL = f"""
+    SELECT {KEY_TABLE}.post_id FROM {FTS_TABLE}
+    JOIN {KEY_TABLE} ON {KEY_TABLE}.id = {FTS_TABLE}.rowid
+    WHERE {FTS_TABLE} MATCH %s AND {KEY_TABLE}.post_id IN ({{scope}})
+    ORDER BY {FTS_TABLE}.rank
+    LIMIT %s OFFSET %s
+"""
+
+TOKEN_RE = re.compile(r"\w+")
+
+
+def fts_enabled() -> bool:
+    return connection.vendor == "sqlite"
+
+
+def install(apps=None, schema_editor=None):
+    """(Re)create the index, its triggers and rebuild it. Migration-safe."""
+    conn = schema_editor.connection if schema_editor else connection
+    if conn.vendor != "sqlite":
+        return
+    with conn.cursor() as cursor:
+        for sql in INSTALL_SQL:
+            cursor.execute(sql)
+
+
+def reinstall(apps=None, schema_editor=None):
+    uninstall(apps, schema_editor)
+    install(apps, schema_editor)
+
+
+def uninstall(apps=None, schema_editor=None):
+    conn = schema_editor.connection if schema_editor else connection
+    if conn.vendor != "sqlite":
+        return
+    with conn.cursor() as cursor:
+        for sql in UNINSTALL_SQL:
+            cursor.execute(sql)
+
+
+def build_match_query(query: str) -> str:
+    """
+    Turn free text into a safe FTS5 query: every word must match, the last
+    one as a prefix so results follow the user while typing.
+    """
+    tokens = TOKEN_RE.findall(query)
+    if not tokens:
+        return ""
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def _ranked_post_ids(
+    queryset: QuerySet, match: str, limit: int, offset: int
+) -> list:
+    # Rank inside the caller's scope, e.g. queryset_request filters.
+    scope_sql, scope_params = queryset.order_by().values("pk").query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            SEARCH_SQL.format(scope=scope_sql),
+            [match, *scope_params, limit, offset],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+async def search_posts(
+    queryset: QuerySet, query: str, limit: int, offset: int = 0
+) -> list:
+    """Return posts of ``queryset`` matching ``query``, best match first."""
+    if not fts_enabled():
+        words = TOKEN_RE.findall(query)
+        if not words:
+            return []
+        for word in words:
+            queryset = queryset.filter(
+                Q(title__icontains=word) | Q(content__icontains=word)
+            )
+        return [post async for post in queryset[offset : offset + limit]]
+
+    match = build_match_query(query)
+    if not match:
+        return []
+    ids = await sync_to_async(_ranked_post_ids)(queryset, match, limit, offset)
+    pk_field = queryset.model._meta.pk
+    ids = [pk_field.to_python(pk) for pk in ids]
+    posts = {post.pk: post async for post in queryset.filter(pk__in=ids)}
+    return [posts[pk] for pk in ids if pk in posts]
@@ -0,0 +1,180 @@
+from functools import partial
+
+from django.apps import apps
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from api import counters, feed, models
+from api.cache import author_cache
+from api.response_cache import response_cache
+from api.taxonomy import taxonomy_index
+
+
+def invalidate_responses(sender, **kwargs):
+    response_cache.invalidate(sender)
+
+
+# Connected per model rather than for any sender: through models left
+# without delete receivers can be deleted in a single query.
+for model in apps.get_app_config("api").get_models():
+    post_save.connect(invalidate_responses, sender=model)
+    post_delete.connect(invalidate_responses, sender=model)
+
+
+@receiver(post_save, sender=models.Author)
+@receiver(post_delete, sender=models.Author)
+def invalidate_author(sender, instance, **kwargs):
+    # Signals rather than model hooks: queryset deletes send them too.
+    author_cache.invalidate(instance)
+
+
+@receiver(m2m_changed)
+def invalidate_relation_responses(sender, instance, action, model, **kwargs):
+    # Both sides may render the relation, e.g. post tags and tag posts.
+    if action.startswith("post_") and sender._meta.app_label == "api":
+        response_cache.invalidate(type(instance), model)
+
+
+def _adjust_counters(instance, delta: int, deleted=frozenset()):
+    if (tracked := counters.pending()) is not None:
+        tracked.track(instance)
+        return
+    # Rows deleted along with the instance are left alone. Queryset updates
+    # skip the model hooks and signals, so drop the cached author and
+    # responses here.
+    field = f"{instance._meta.model_name}_count"
+    changed = []
+    if (models.Author, instance.author_id) not in deleted:
+        counters.increment(
+            models.Author.objects.filter(pk=instance.author_id), **{field: delta}
+        )
+        author_cache.delete_where(lambda cached: cached.pk == instance.author_id)
+        changed.append(models.Author)
+    if (
+        isinstance(instance, models.Comment)
+        and (models.Post, instance.post_id) not in deleted
+    ):
+        counters.increment(
+            models.Post.objects.filter(pk=instance.post_id), comment_count=delta
+        )
+        changed.append(models.Post)
+    response_cache.invalidate(*changed)
+
+
+@receiver(post_save, sender=models.Post)
+@receiver(post_save, sender=models.Comment)
+def count_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        _adjust_counters(instance, 1)
+
+
+@receiver(pre_delete, sender=models.Author)
+@receiver(pre_delete, sender=models.Post)
+def mark_deleted(sender, instance, origin=None, **kwargs):
+    # pre_delete is sent for the whole cascade before any row goes, and
+    # every signal of a delete shares its origin, the deleted instance or
+    # queryset.
+    if origin is not None:
+        origin.__dict__.setdefault("_deleted_counted", set()).add(
+            (sender, instance.pk)
+        )
+
+
+@receiver(post_delete, sender=models.Post)
+@receiver(post_delete, sender=models.Comment)
+def count_deleted(sender, instance, origin=None, **kwargs):
+    _adjust_counters(instance, -1, getattr(origin, "_deleted_counted", frozenset()))
+
+
+@receiver(m2m_changed, sender=models.Post.tags.through)
+@receiver(m2m_changed, sender=models.Post.categories.through)
+def count_relations(sender, instance, action, reverse, pk_set, **kwargs):
+    # The relations are declared on Tag and Category, reverse means the
+    # instance is the post.
+    if reverse:
+        pks = [instance.pk]
+    elif action == "pre_clear":
+        # The cleared posts are gone from the through table afterwards.
+        instance._cleared_post_pks = list(
+            sender.objects.filter(
+                **{type(instance)._meta.model_name: instance}
+            ).values_list("post_id", flat=True)
+        )
+        return
+    elif action == "post_clear":
+        pks = instance.__dict__.pop("_cleared_post_pks", [])
+    else:
+        pks = pk_set
+    if not action.startswith("post_") or not pks:
+        return
+    counters.recount_relation(sender, pks)
+    response_cache.invalidate(models.Post)
+
+
+@receiver(pre_delete, sender=models.Tag)
+@receiver(pre_delete, sender=models.Category)
+def collect_related_posts(sender, instance, **kwargs):
+    # The cascade deletes the through rows without sending m2m_changed.
+    instance._related_post_pks = list(instance.posts.values_list("pk", flat=True))
+
+
+@receiver(post_delete, sender=models.Tag)
+@receiver(post_delete, sender=models.Category)
+def count_deleted_relations(sender, instance, **kwargs):
+    pks = instance.__dict__.pop("_related_post_pks", [])
+    if not pks:
+        return
+    if (tracked := counters.pending()) is not None:
+        tracked.posts.update(pks)
+        return
+    counters.recount_relation(sender.posts.through, pks)
+    response_cache.invalidate(models.Post)
+
+
+@receiver(post_save, sender=models.Post)
+@receiver(post_save, sender=models.Comment)
+def save_feed_entry(sender, instance, raw=False, **kwargs):
+    # Deleted with the post or comment through their foreign keys.
+    if not raw:
+        feed.save_entries([instance])
+
+
+# The taxonomy index is updated once the change is committed.
+
+
+@receiver(m2m_changed, sender=models.Post.tags.through)
+@receiver(m2m_changed, sender=models.Post.categories.through)
+def index_relations(sender, instance, action, reverse, model, pk_set, **kwargs):
+    related = model if reverse else type(instance)
+    if action == "post_clear":
+        if reverse:
+            update = partial(taxonomy_index.forget_posts, [instance.pk], [related])
+        else:
+            update = partial(taxonomy_index.clear_related, related, instance.pk)
+    elif action in ("post_add", "post_remove"):
+        pairs = [
+            (instance.pk, pk) if reverse else (pk, instance.pk) for pk in pk_set
+        ]
+        update = partial(taxonomy_index.link, related, pairs, action == "post_add")
+    else:
+        return
+    transaction.on_commit(update)
+
+
+@receiver(post_delete, sender=models.Post)
+def unindex_post(sender, instance, **kwargs):
+    transaction.on_commit(partial(taxonomy_index.forget_posts, [instance.pk]))
+
+
+@receiver(post_save, sender=models.Tag)
+@receiver(post_save, sender=models.Category)
+def index_name(sender, instance, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(partial(taxonomy_index.saved, instance))
+
+
+@receiver(post_delete, sender=models.Tag)
+@receiver(post_delete, sender=models.Category)
+def unindex_name(sender, instance, **kwargs):
+    transaction.on_commit(partial(taxonomy_index.deleted, instance))
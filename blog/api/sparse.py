@@ -0,0 +1,144 @@
+"""
+Sparse fieldsets: ``?fields=id,title`` narrows list and retrieve responses
+to those fields of the ReadSerializer.
+
+The requested fields are set on the request as ``sparse_fields``, which
+``Base.queryset_request`` passes to ``narrow`` so the query only joins the
+relations and loads the columns they need. Rows are then serialized with a
+schema restricted to the fields and rendered directly, bypassing the full
+response schema of the view.
+"""
+
+from functools import lru_cache, wraps
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import QuerySet
+from django.http import HttpRequest
+from ninja import Schema
+from ninja_aio.exceptions import NotFoundError, SerializeError
+from pydantic import create_model
+
+
+def requested_fields(request: HttpRequest, schema: type[Schema]) -> tuple | None:
+    """The ``fields`` query parameter checked against ``schema``, if given."""
+    if "fields" not in request.GET:
+        return None
+    fields = tuple(
+        dict.fromkeys(
+            name.strip() for name in request.GET["fields"].split(",") if name.strip()
+        )
+    )
+    unknown = [name for name in fields if name not in schema.model_fields]
+    if not fields or unknown:
+        raise SerializeError(
+            {"fields": f"choose among {', '.join(schema.model_fields)}"}, 400
+        )
+    return fields
+
+
+@lru_cache
+def sparse_schema(
+    schema: type[Schema], fields: tuple, suffix: str = "Sparse"
+) -> type[Schema]:
+    return create_model(
+        f"{schema.__name__}{suffix}",
+        __base__=Schema,
+        **{
+            name: (schema.model_fields[name].annotation, schema.model_fields[name])
+            for name in fields
+        },
+    )
+
+
+def narrow(queryset: QuerySet, fields: tuple) -> QuerySet:
+    """Restrict the joins, prefetches and columns of ``queryset`` to ``fields``."""
+    model = queryset.model
+    util = model.util
+    relateds = [name for name in util.get_select_relateds() if name in fields]
+    queryset = queryset.select_related(None).prefetch_related(None)
+    if relateds:
+        # select_related() without arguments would follow every foreign key.
+        queryset = queryset.select_related(*relateds)
+    queryset = queryset.prefetch_related(
+        *(name for name in util.get_reverse_relations() if name in fields)
+    )
+    columns = {model._meta.pk.name, "created_at"}
+    for name in fields:
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # Computed fields, e.g. Author.full_name, may need any column.
+            columns = None
+            break
+        if field.concrete:
+            columns.add(name)
+    for name in relateds:
+        # Nested objects show the excerpt, see Base.get_related_schema_data.
+        related = model._meta.get_field(name).related_model
+        source = getattr(related, "excerpt_source", None)
+        if source is None:
+            continue
+        if columns is None:
+            queryset = queryset.defer(f"{name}__{source}")
+        else:
+            # defer() of a relation is ignored once only() is set.
+            columns.update(
+                f"{name}__{field.name}"
+                for field in related._meta.concrete_fields
+                if field.name != source
+            )
+    return queryset if columns is None else queryset.only(*columns)
+
+
+@sync_to_async
+def _serialize(schema: type[Schema], objs: list) -> list[dict]:
+    return [schema.from_orm(obj).model_dump() for obj in objs]
+
+
+def sparse_list(viewset):
+    """Paginated list view decorator, applied outside of ``paginate``."""
+
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(request, *args, **kwargs):
+            fields = requested_fields(request, viewset.schema_out)
+            if fields is None:
+                # Validated by ninja against the list schema of the view.
+                if viewset.list_excludes:
+                    request.sparse_fields = viewset.list_fields
+                return await func(request, *args, **kwargs)
+            request.sparse_fields = fields
+            page = await func(request, *args, **kwargs)
+            page["items"] = await _serialize(
+                sparse_schema(viewset.schema_out, fields), page["items"]
+            )
+            return viewset.api.create_response(request, page, status=200)
+
+        return wrapper
+
+    return decorator
+
+
+def sparse_retrieve(viewset):
+    """Retrieve view decorator, fetching the object itself when narrowed."""
+
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(request, *args, **kwargs):
+            fields = requested_fields(request, viewset.schema_out)
+            if fields is None:
+                return await func(request, *args, **kwargs)
+            request.sparse_fields = fields
+            queryset = await viewset.model_util.get_objects(request, is_for_read=True)
+            obj = await queryset.filter(pk=viewset._get_pk(kwargs["pk"])).afirst()
+            if obj is None:
+                raise NotFoundError(viewset.model)
+            (data,) = await _serialize(
+                sparse_schema(viewset.schema_out, fields), [obj]
+            )
+            return viewset.api.create_response(request, data, status=200)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,266 @@
+"""
+In-process index of the posts of each tag and category.
+
+Tags and categories are small tables, while filtering posts on them joins
+the through tables. The index keeps, per tag and category, the ids of its
+posts as a sorted array, so ``?tags=a,b&categories=c`` resolves to an id
+list without joins and tag clouds are counted without queries.
+
+The index is per process: it is loaded on first use, kept current by the
+signals and bulk writes of the process (see ``api.signals``) and reloaded
+after ``TAXONOMY_INDEX_TTL`` seconds to pick up those of other processes.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Iterable
+from uuid import UUID
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import CharField, QuerySet
+from django.db.models.functions import Cast
+from ninja_aio.decorators import api_get
+
+from api import models, schema
+
+# Post relation, also the query parameter filtering on it, and its model.
+TAXONOMY_MODELS = {"tags": models.Tag, "categories": models.Category}
+
+
+class PostIds:
+    """Sorted post ids, packed in 16 bytes each."""
+
+    __slots__ = ("_data",)
+
+    def __init__(self, data: bytes = b""):
+        self._data = bytearray(data)
+
+    @classmethod
+    def from_hex(cls, pks: list[str]) -> "PostIds":
+        # Lowercase hex sorts like the bytes, with or without hyphens.
+        return cls(bytes.fromhex("".join(sorted(pks)).replace("-", "")))
+
+    def __len__(self):
+        return len(self._data) // 16
+
+    def __getitem__(self, index: int) -> bytes:
+        # Raw ids, for bisect.
+        return bytes(self._data[index * 16 : index * 16 + 16])
+
+    def _find(self, raw: bytes) -> tuple[int, bool]:
+        index = bisect_left(self, raw)
+        return index, index < len(self) and self[index] == raw
+
+    def __contains__(self, raw: bytes):
+        return self._find(raw)[1]
+
+    def raw(self) -> Iterable[bytes]:
+        for start in range(0, len(self._data), 16):
+            yield bytes(self._data[start : start + 16])
+
+    def add(self, pk: UUID):
+        index, found = self._find(pk.bytes)
+        if not found:
+            self._data[index * 16 : index * 16] = pk.bytes
+
+    def discard(self, pk: UUID):
+        index, found = self._find(pk.bytes)
+        if found:
+            del self._data[index * 16 : index * 16 + 16]
+
+
+class TaxonomyIndex:
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._names: dict[type, dict[str, UUID]] = {}
+        self._posts: dict[type, dict[UUID, PostIds]] = {}
+        self._loaded_at: float | None = None
+        self._stale_names: set[type] = set()
+        # Readers and signal handlers only hold _lock briefly, loading runs
+        # outside of it and swaps the result in.
+        self._lock = threading.Lock()
+        self._loading = threading.Lock()
+
+    @property
+    def expired(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl
+
+    @property
+    def stale(self) -> bool:
+        return self.expired or bool(self._stale_names)
+
+    def load(self):
+        with self._loading:
+            if self.expired:
+                names = {
+                    model: dict(model.objects.values_list("name", "pk"))
+                    for model in TAXONOMY_MODELS.values()
+                }
+                posts = {
+                    model: self._load_posts(model)
+                    for model in TAXONOMY_MODELS.values()
+                }
+                # Changes signalled while loading may be missing until the
+                # next load.
+                with self._lock:
+                    self._names, self._posts = names, posts
+                    self._stale_names.clear()
+                    self._loaded_at = time.monotonic()
+            elif self._stale_names:
+                with self._lock:
+                    stale, self._stale_names = self._stale_names, set()
+                names = {
+                    model: dict(model.objects.values_list("name", "pk"))
+                    for model in stale
+                }
+                with self._lock:
+                    self._names.update(names)
+
+    async def aload(self):
+        if self.stale:
+            await sync_to_async(self.load)()
+
+    def _load_posts(self, model) -> dict[UUID, PostIds]:
+        # Ids read as text skip the UUID conversion of millions of rows.
+        column = f"{model._meta.model_name}_id"
+        pairs = defaultdict(list)
+        for related_pk, post_pk in model.posts.through.objects.values_list(
+            Cast(column, CharField()), Cast("post_id", CharField())
+        ).iterator(chunk_size=10_000):
+            pairs[related_pk].append(post_pk)
+        return {UUID(pk): PostIds.from_hex(post_pks) for pk, post_pks in pairs.items()}
+
+    def clear(self):
+        with self._lock:
+            self._names, self._posts = {}, {}
+            self._stale_names.clear()
+            self._loaded_at = None
+
+    def expire_names(self, *related_models):
+        """Reload the names of ``related_models`` on next use, after bulk writes."""
+        with self._lock:
+            if self._loaded_at is not None:
+                self._stale_names.update(related_models)
+
+    def link(self, model, pairs: Iterable[tuple[UUID, UUID]], attach: bool):
+        """Add or remove ``(post_pk, related_pk)`` links."""
+        with self._lock:
+            if model not in self._posts:
+                return
+            posts = self._posts[model]
+            for post_pk, related_pk in pairs:
+                ids = posts.setdefault(related_pk, PostIds())
+                if attach:
+                    ids.add(post_pk)
+                else:
+                    ids.discard(post_pk)
+
+    def clear_related(self, model, related_pk: UUID):
+        with self._lock:
+            if model in self._posts:
+                self._posts[model].pop(related_pk, None)
+
+    def forget_posts(self, post_pks: Iterable[UUID], related_models=None):
+        post_pks = list(post_pks)
+        with self._lock:
+            for model in related_models or TAXONOMY_MODELS.values():
+                for ids in self._posts.get(model, {}).values():
+                    for pk in post_pks:
+                        ids.discard(pk)
+
+    def saved(self, instance):
+        with self._lock:
+            if (names := self._names.get(type(instance))) is None:
+                return
+            for name in [name for name, pk in names.items() if pk == instance.pk]:
+                del names[name]
+            names[instance.name] = instance.pk
+
+    def deleted(self, instance):
+        with self._lock:
+            if (names := self._names.get(type(instance))) is None:
+                return
+            names.pop(instance.name, None)
+            self._posts[type(instance)].pop(instance.pk, None)
+
+    def post_ids(
+        self, wanted: dict[type, list[str]], limit: int
+    ) -> list[UUID] | None:
+        """
+        Ids of the posts related to every name in ``wanted``, or None when
+        the smallest of their sets holds more than ``limit`` posts.
+        """
+        with self._lock:
+            sets = []
+            for model, names in wanted.items():
+                for name in names:
+                    if (pk := self._names[model].get(name)) is None:
+                        return []
+                    sets.append(self._posts[model].get(pk, PostIds()))
+            smallest, *others = sorted(sets, key=len)
+            if len(smallest) > limit:
+                return None
+            return [
+                UUID(bytes=raw)
+                for raw in smallest.raw()
+                if all(raw in ids for ids in others)
+            ]
+
+    def counts(self, model) -> list[dict]:
+        """Post count of each name, most used first."""
+        with self._lock:
+            posts = self._posts[model]
+            counts = [
+                {"name": name, "posts": len(posts.get(pk, ()))}
+                for name, pk in self._names[model].items()
+            ]
+        return sorted(counts, key=lambda row: (-row["posts"], row["name"]))
+
+
+taxonomy_index = TaxonomyIndex(ttl=settings.TAXONOMY_INDEX_TTL)
+
+
+def _split(value: str) -> list[str]:
+    return list(
+        dict.fromkeys(name.strip() for name in value.split(",") if name.strip())
+    )
+
+
+async def filter_posts(queryset: QuerySet, filters: dict) -> QuerySet:
+    """
+    Posts of ``queryset`` having every tag and category named in the
+    comma separated ``tags`` and ``categories`` filters, popped from
+    ``filters``.
+    """
+    wanted = {
+        relation: names
+        for relation in TAXONOMY_MODELS
+        if (names := _split(filters.pop(relation, None) or ""))
+    }
+    if not wanted:
+        return queryset
+    await taxonomy_index.aload()
+    pks = taxonomy_index.post_ids(
+        {TAXONOMY_MODELS[relation]: names for relation, names in wanted.items()},
+        settings.TAXONOMY_FILTER_MAX_IDS,
+    )
+    if pks is not None:
+        return queryset.filter(pk__in=pks)
+    # Too many ids for an IN list, where the joins stay cheap.
+    for relation, names in wanted.items():
+        for name in names:
+            queryset = queryset.filter(**{f"{relation}__name": name})
+    return queryset
+
+
+class TaxonomyViewSetMixin:
+    """Adds ``GET /cloud`` counting the posts of each object, from the index."""
+
+    @api_get("/cloud", response={200: list[schema.TaxonomyCountSchema]})
+    async def cloud(self, request):
+        """Post count of every object, most used first."""
+        await taxonomy_index.aload()
+        return taxonomy_index.counts(self.model)
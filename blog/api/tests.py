@@ -1,3 +1,1144 @@
-from django.test import TestCase
+import asyncio
+import csv
+import json
+import tempfile
+import threading
+import time
+from collections import Counter
+from io import StringIO
+from ipaddress import IPv4Address
+from pathlib import Path
+from unittest import mock
+from uuid import uuid4
 
-# Create your tests here.
+from django.apps import apps
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.http import HttpRequest
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from joserfc import jwt
+from ninja_aio.renders import ORJSONRenderer as BaseORJSONRenderer
+
+from api import excerpts, models, search
+from api.auth import AuthorAuth, RefreshAuth
+from api.cache import author_cache, jwt_cache
+from api.hashing import HashingPool, HashingUnavailableError, hashing_pool
+from api.management.commands import load_test
+from api.management.data import POSTS_DATA
+from api.metrics import QueryBudgetExceeded, registry
+from api.pagination import CursorPagination
+from api.renderers import ORJSONRenderer
+from api.response_cache import DjangoCacheBackend, response_cache
+from api.taxonomy import taxonomy_index
+
+
+def create_author(username: str, **fields) -> models.Author:
+    """An author named after ``username``, e.g. Ada Reed for "ada.reed"."""
+    first_name, _, last_name = username.partition(".")
+    return models.Author.objects.create(
+        **{
+            "username": username,
+            "email": f"{username}@example.com",
+            "first_name": first_name.capitalize(),
+            "last_name": last_name.capitalize(),
+            "password": "Password123!",
+        }
+        | fields
+    )
+
+
+def auth_headers(author: models.Author) -> dict:
+    return {"HTTP_AUTHORIZATION": f"Bearer {author.create_access_token()}"}
+
+
+class AuthorTestCase(TestCase):
+    """Creates ``author`` and the ``headers`` of their requests."""
+
+    username = "ada.lovelace"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_author(cls.username)
+
+    def setUp(self):
+        self.headers = auth_headers(self.author)
+
+
+class AuthorCacheTest(AuthorTestCase):
+    username = "mia.ford"
+
+    def setUp(self):
+        super().setUp()
+        author_cache.clear()
+        # Caches the author.
+        self.assertEqual(self._me().status_code, 200)
+        self.assertIsNotNone(author_cache.get(self.username))
+
+    def _me(self):
+        return self.client.get("/api/authors/me", **self.headers)
+
+    def test_change_password(self):
+        response = self.client.post(
+            "/api/login/change-password",
+            {"old_password": "Password123!", "new_password": "Password456!"},
+            content_type="application/json",
+            **self.headers,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(author_cache.get(self.username))
+
+    def test_update(self):
+        response = self.client.patch(
+            f"/api/authors/{self.author.pk}",
+            {"first_name": "Maya"},
+            content_type="application/json",
+            **self.headers,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._me().json()["full_name"], "Maya Ford")
+
+    def test_queryset_delete(self):
+        models.Author.objects.filter(pk=self.author.pk).delete()
+        self.assertIsNone(author_cache.get(self.username))
+        self.assertEqual(self._me().status_code, 401)
+
+
+class JwtCacheTest(AuthorTestCase):
+    username = "theo.lake"
+
+    def setUp(self):
+        super().setUp()
+        jwt_cache.clear()
+
+    async def test_hit_skips_decoding(self):
+        token = self.author.create_access_token()
+        with mock.patch("api.auth.jwt.decode", wraps=jwt.decode) as decode:
+            for _ in range(2):
+                author = await AuthorAuth().authenticate(HttpRequest(), token)
+                self.assertEqual(author.pk, self.author.pk)
+        self.assertEqual(decode.call_count, 1)
+
+    async def test_expired_token_rejected_once_cached(self):
+        token = self.author.create_access_token()
+        self.assertTrue(await AuthorAuth().authenticate(HttpRequest(), token))
+        later = settings.JWT_ACCESS_DURATION + 1
+        with (
+            mock.patch("time.time", return_value=time.time() + later),
+            mock.patch("time.monotonic", return_value=time.monotonic() + later),
+        ):
+            self.assertFalse(await AuthorAuth().authenticate(HttpRequest(), token))
+
+    async def test_access_and_refresh_kept_apart(self):
+        access, refresh = self.author.create_jwt_tokens()
+        self.assertTrue(await AuthorAuth().authenticate(HttpRequest(), access))
+        self.assertTrue(await RefreshAuth().authenticate(HttpRequest(), refresh))
+        self.assertFalse(await AuthorAuth().authenticate(HttpRequest(), refresh))
+        self.assertFalse(await RefreshAuth().authenticate(HttpRequest(), access))
+
+
+class HashingPoolTest(AuthorTestCase):
+    username = "ruth.vale"
+
+    async def test_rejects_past_capacity(self):
+        pool = HashingPool(workers=1, max_pending=1)
+        release = threading.Event()
+        jobs = [asyncio.ensure_future(pool.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with self.assertRaises(HashingUnavailableError):
+            await pool.run(release.wait)
+        release.set()
+        await asyncio.gather(*jobs)
+        self.assertEqual((pool.completed, pool.rejected), (2, 1))
+
+    def test_saturated_login_returns_503(self):
+        full = hashing_pool.workers + hashing_pool.max_pending
+        with mock.patch.object(hashing_pool, "in_flight", full):
+            response = self.client.post(
+                "/api/login",
+                {"username": self.username, "password": "Password123!"},
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, 503)
+
+
+class ListQueryCountTest(AuthorTestCase):
+    """List endpoints must issue a constant number of queries per page."""
+
+    username = "luna.wright"
+
+    def setUp(self):
+        super().setUp()
+        author_cache.clear()
+        jwt_cache.clear()
+
+    def _create_rows(self, count: int):
+        for i in range(count):
+            post = models.Post.objects.create(
+                author=self.author, title=f"Post {i}", content="content"
+            )
+            models.Comment.objects.create(
+                author=self.author, post=post, content="comment"
+            )
+
+    def _count_queries(self, url: str) -> int:
+        self.client.get(url, **self.headers)  # warm the auth caches
+        response_cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, **self.headers)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx)
+
+    def assertConstantQueries(self, url: str):
+        self._create_rows(1)
+        expected = self._count_queries(url)
+        self._create_rows(20)
+        self.assertEqual(self._count_queries(url), expected)
+
+    def test_post_list(self):
+        self.assertConstantQueries("/api/posts")
+
+    def test_post_by_author(self):
+        self.assertConstantQueries(f"/api/posts/by-author/{self.author.pk}")
+
+    def test_post_by_me(self):
+        self.assertConstantQueries("/api/posts/by-me")
+
+    def test_comment_list(self):
+        self.assertConstantQueries("/api/comments")
+
+    def test_comment_by_author(self):
+        self.assertConstantQueries(f"/api/comments/by-author/{self.author.pk}")
+
+    def test_comment_by_me(self):
+        self.assertConstantQueries("/api/comments/by-me")
+
+
+class CursorPaginationTest(AuthorTestCase):
+    username = "ethan.cole"
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.posts = [
+            models.Post.objects.create(
+                author=cls.author, title=f"Post {i}", content="content"
+            )
+            for i in range(7)
+        ]
+
+    def test_walks_every_post_once_newest_first(self):
+        ids, cursor = [], None
+        while True:
+            params = {"page_size": 3} | ({"cursor": cursor} if cursor else {})
+            body = self.client.get("/api/posts/by-me", params, **self.headers).json()
+            self.assertNotIn("count", body)
+            ids += [item["id"] for item in body["items"]]
+            cursor = body["next"]
+            if cursor is None:
+                break
+        self.assertEqual(ids, [str(post.pk) for post in reversed(self.posts)])
+
+    def test_sync_pages_match_async(self):
+        paginator = CursorPagination()
+        queryset = models.Post.objects.filter(author=self.author)
+        pages, cursor = [], None
+        while True:
+            page = paginator.paginate_queryset(
+                queryset, CursorPagination.Input(cursor=cursor, page_size=3), None
+            )
+            pages.append([post.pk for post in page["items"]])
+            cursor = page["next"]
+            if cursor is None:
+                break
+        self.assertEqual(sum(pages, []), [post.pk for post in reversed(self.posts)])
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+
+    def test_invalid_cursor(self):
+        valid_json = CursorPagination.encode_cursor(timezone.now(), "zzz")
+        for cursor in ("not-a-cursor", valid_json):
+            response = self.client.get("/api/posts", {"cursor": cursor}, **self.headers)
+            self.assertEqual(response.status_code, 400)
+
+
+class PostSearchTest(AuthorTestCase):
+    username = "maya.stewart"
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.async_post = models.Post.objects.create(
+            author=cls.author, title="Async Django", content="Running queries"
+        )
+        cls.recipe = models.Post.objects.create(
+            author=cls.author, title="Pasta", content="A django django recipe"
+        )
+
+    def _search(self, query: str) -> list[str]:
+        response = self.client.get("/api/posts/search", {"q": query}, **self.headers)
+        self.assertEqual(response.status_code, 200)
+        return [item["title"] for item in response.json()]
+
+    def test_ranked_match_on_title_and_content(self):
+        self.assertEqual(self._search("django"), ["Pasta", "Async Django"])
+        self.assertEqual(self._search("run quer"), ["Async Django"])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.recipe.content = "A risotto recipe"
+        self.recipe.save()
+        self.assertEqual(self._search("risotto"), ["Pasta"])
+        self.async_post.delete()
+        self.assertEqual(self._search("django"), [])
+
+    def test_index_survives_table_rebuild(self):
+        models.Post.objects.create(
+            author=self.author, title="Cheese", content="Aged parmesan"
+        )
+        # Frees the first rowids, then remakes api_post like an SQLite
+        # migration or VACUUM would, renumbering the rows that remain.
+        self.async_post.delete()
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT sql FROM sqlite_master WHERE name = 'api_post'")
+            (create,) = cursor.fetchone()
+            cursor.execute(create.replace('"api_post"', '"new__api_post"', 1))
+            cursor.execute("INSERT INTO new__api_post SELECT * FROM api_post")
+            cursor.execute("DROP TABLE api_post")
+            cursor.execute("ALTER TABLE new__api_post RENAME TO api_post")
+        self.assertEqual(self._search("recipe"), ["Pasta"])
+        self.assertEqual(self._search("parmesan"), ["Cheese"])
+        search.install()
+        models.Post.objects.create(
+            author=self.author, title="Bread", content="Sourdough"
+        )
+        self.assertEqual(self._search("sourdough"), ["Bread"])
+        self.assertEqual(self._search("parmesan"), ["Cheese"])
+
+
+class ResponseCacheTest(AuthorTestCase):
+    username = "nora.hayes"
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.tag = models.Tag.objects.create(name="django")
+        cls.post = models.Post.objects.create(
+            author=cls.author, title="Caching", content="content"
+        )
+
+    def setUp(self):
+        super().setUp()
+        response_cache.clear()
+
+    def test_hit_skips_the_database(self):
+        first = self.client.get("/api/tags", **self.headers)
+        with CaptureQueriesContext(connection) as ctx:
+            second = self.client.get("/api/tags", **self.headers)
+        self.assertEqual(len(ctx), 0)
+        self.assertEqual(second.content, first.content)
+
+    def test_writes_invalidate(self):
+        self.client.get("/api/tags", **self.headers)
+        models.Tag.objects.create(name="ninja")
+        body = self.client.get("/api/tags", **self.headers).json()
+        self.assertEqual(len(body["items"]), 2)
+
+        self.client.get(f"/api/posts/{self.post.pk}", **self.headers)
+        self.author.first_name = "Eleanor"
+        self.author.save()
+        body = self.client.get(f"/api/posts/{self.post.pk}", **self.headers).json()
+        self.assertEqual(body["author"]["full_name"], "Eleanor Hayes")
+
+    def test_scoped_by_author(self):
+        self.client.get("/api/posts", **self.headers)
+        headers = auth_headers(create_author("omar.reed"))
+        self.assertEqual(self.client.get("/api/posts", **headers).json()["items"], [])
+
+    def test_not_modified(self):
+        url = f"/api/tags/{self.tag.pk}"
+        etag = self.client.get(url, **self.headers)["ETag"]
+        hit = self.client.get(url, HTTP_IF_NONE_MATCH=etag, **self.headers)
+        response_cache.clear()
+        miss = self.client.get(url, HTTP_IF_NONE_MATCH=etag, **self.headers)
+        self.assertEqual((hit.status_code, miss.status_code), (304, 304))
+        self.assertIn("Last-Modified", miss)
+
+    def test_django_cache_backend(self):
+        backend = DjangoCacheBackend()
+        backend.clear()
+        with mock.patch.object(response_cache, "backend", backend):
+            first = self.client.get("/api/tags", **self.headers)
+            with CaptureQueriesContext(connection) as ctx:
+                second = self.client.get("/api/tags", **self.headers)
+            self.assertEqual(len(ctx), 0)
+            self.assertEqual(second.content, first.content)
+            models.Tag.objects.create(name="ninja")
+            body = self.client.get("/api/tags", **self.headers).json()
+            self.assertEqual(len(body["items"]), 2)
+            # Batch views invalidate through the async cache API.
+            self.client.post(
+                "/api/tags/batch",
+                {"items": [{"name": "batch"}]},
+                content_type="application/json",
+                **self.headers,
+            )
+            body = self.client.get("/api/tags", **self.headers).json()
+        self.assertEqual(len(body["items"]), 3)
+
+
+class ConditionalGetTest(AuthorTestCase):
+    username = "iris.bell"
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        post = models.Post.objects.create(author=cls.author, title="T", content="C")
+        cls.comment = models.Comment.objects.create(
+            author=cls.author, post=post, content="comment"
+        )
+
+    def _revalidate(self, url: str, etag: str):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag, **self.headers)
+
+    def test_list_not_modified_without_fetching_rows(self):
+        etag = self.client.get("/api/comments", **self.headers)["ETag"]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self._revalidate("/api/comments", etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(len(ctx), 1)
+        self.assertIn("COUNT(*)", ctx[0]["sql"])
+
+    def test_changes_invalidate_validators(self):
+        url = f"/api/comments/{self.comment.pk}"
+        list_etag = self.client.get("/api/comments", **self.headers)["ETag"]
+        etag = self.client.get(url, **self.headers)["ETag"]
+        self.assertEqual(self._revalidate(url, etag).status_code, 304)
+
+        self.author.last_name = "Stone"
+        self.author.save()
+        self.assertEqual(self._revalidate(url, etag).status_code, 200)
+        self.comment.delete()
+        self.assertEqual(self._revalidate("/api/comments", list_etag).status_code, 200)
+
+    def test_counters_change_validators(self):
+        post = self.comment.post
+        urls = [f"/api/posts/{post.pk}", "/api/posts"]
+        etags = [self.client.get(url, **self.headers)["ETag"] for url in urls]
+        models.Comment.objects.create(author=self.author, post=post, content="c")
+        post_updated_at = models.Post.objects.get(pk=post.pk).updated_at
+        self.assertEqual(post_updated_at, post.updated_at)
+        for url, etag in zip(urls, etags):
+            self.assertEqual(self._revalidate(url, etag).status_code, 200)
+
+
+class CountersTest(AuthorTestCase):
+    username = "leo.grant"
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.post = models.Post.objects.create(author=cls.author, title="T", content="C")
+        cls.tags = [models.Tag.objects.create(name=f"tag{i}") for i in range(3)]
+
+    def assertCounts(self, obj, **expected):
+        obj.refresh_from_db()
+        self.assertEqual({field: getattr(obj, field) for field in expected}, expected)
+
+    def test_comments_and_cascades(self):
+        models.Comment.objects.create(author=self.author, post=self.post, content="c")
+        self.author.first_name = "Leon"
+        self.author.save()  # a stale instance must not reset the counters
+        self.assertCounts(self.post, comment_count=1)
+        self.assertCounts(self.author, post_count=1, comment_count=1)
+
+        self.post.delete()
+        self.assertCounts(self.author, post_count=0, comment_count=0)
+
+    def test_cascades_skip_deleted_rows(self):
+        reader = create_author("nora.grant")
+        for author in (self.author, reader, reader):
+            models.Comment.objects.create(author=author, post=self.post, content="c")
+        with CaptureQueriesContext(connection) as ctx:
+            self.post.delete()
+        updates = [query["sql"] for query in ctx if query["sql"].startswith("UPDATE")]
+        # One per comment author, none for the deleted post.
+        self.assertEqual(len(updates), 4)
+        self.assertTrue(all('"api_author"' in sql for sql in updates))
+        self.assertCounts(self.author, post_count=0, comment_count=0)
+        self.assertCounts(reader, comment_count=0)
+
+        post = models.Post.objects.create(author=reader, title="T", content="C")
+        models.Comment.objects.create(author=reader, post=post, content="c")
+        with CaptureQueriesContext(connection) as ctx:
+            models.Author.objects.filter(pk=reader.pk).delete()
+        self.assertFalse(any(query["sql"].startswith("UPDATE") for query in ctx))
+
+    def test_m2m_changes(self):
+        self.post.tags.add(*self.tags)
+        self.tags[0].posts.remove(self.post)
+        self.assertCounts(self.post, tag_count=2)
+        self.tags[1].posts.clear()
+        self.assertCounts(self.post, tag_count=1)
+        self.post.tags.clear()
+        self.assertCounts(self.post, tag_count=0)
+
+    def test_deleting_related_objects(self):
+        self.post.tags.add(*self.tags)
+        category = models.Category.objects.create(name="news")
+        category.posts.add(self.post)
+
+        response = self.client.delete(f"/api/tags/{self.tags[0].pk}", **self.headers)
+        self.assertEqual(response.status_code, 204)
+        self.assertCounts(self.post, tag_count=2)
+
+        ids = [str(tag.pk) for tag in self.tags[1:]]
+        response = self.client.delete(
+            "/api/tags/batch",
+            {"ids": ids},
+            content_type="application/json",
+            **self.headers,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertCounts(self.post, tag_count=0)
+
+        category.delete()
+        self.assertCounts(self.post, category_count=0)
+
+    def test_reconcile_repairs_drift(self):
+        models.Post.objects.update(comment_count=5, tag_count=2)
+        models.Author.objects.update(post_count=0)
+        call_command("reconcile_counters", stdout=StringIO())
+        self.assertCounts(self.post, comment_count=0, tag_count=0)
+        self.assertCounts(self.author, post_count=1)
+
+
+class BatchTest(AuthorTestCase):
+    username = "ada.frost"
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.post = models.Post.objects.create(author=cls.author, title="T", content="C")
+
+    def setUp(self):
+        super().setUp()
+        author_cache.clear()
+
+    def _batch(self, method: str, url: str, data: dict) -> dict:
+        response = getattr(self.client, method)(
+            url, data, content_type="application/json", **self.headers
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_create_reports_failures_by_index(self):
+        comment = {"author_id": str(self.author.pk), "post_id": str(self.post.pk)}
+        items = [comment | {"content": f"c{i}"} for i in range(20)]
+        items[3] = comment | {"post_id": str(self.author.pk), "content": "c"}
+        items[7] = {"content": "c"}
+        # The author lookup, the existence checks of the authors and posts,
+        # one INSERT each for the comments and their feed entries, the two
+        # counter UPDATEs and the savepoint, whatever the number of items.
+        with self.assertNumQueries(9):
+            body = self._batch("post", "/api/comments/batch", {"items": items})
+        self.assertEqual(body["results"]["count"], 18)
+        errors = {error["index"]: error["errors"] for error in body["errors"]["details"]}
+        self.assertEqual(errors[3], {"post_id": "not found"})
+        self.assertEqual(set(errors[7]), {"author_id", "post_id"})
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 18)
+
+        body = self._batch(
+            "post", "/api/tags/batch", {"items": [{"name": "a"}, {"name": "a"}]}
+        )
+        self.assertEqual(body["errors"]["details"][0]["index"], 1)
+
+    def test_update_and_delete(self):
+        other = models.Post.objects.create(author=self.author, title="O", content="C")
+        body = self._batch(
+            "patch",
+            "/api/posts/batch",
+            {"items": [{"id": str(self.post.pk), "title": "New"}, {"title": "x"}]},
+        )
+        self.assertEqual(body["results"]["details"], [str(self.post.pk)])
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.title, "New")
+
+        ids = [str(self.post.pk), str(other.pk), str(self.author.pk)]
+        body = self._batch("delete", "/api/posts/batch", {"ids": ids})
+        self.assertEqual(body["results"]["count"], 2)
+        self.assertEqual(body["errors"]["details"][0]["index"], 2)
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.post_count, 0)
+
+
+class BulkRelationsTest(AuthorTestCase):
+    username = "max.hill"
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.posts = [
+            models.Post.objects.create(author=cls.author, title=f"P{i}", content="C")
+            for i in range(4)
+        ]
+        cls.tags = [models.Tag.objects.create(name=f"tag{i}") for i in range(3)]
+        cls.posts[0].tags.add(cls.tags[0])
+
+    def _bulk(self, action: str, tags: list) -> dict:
+        response = self.client.post(
+            "/api/posts/tags/bulk",
+            {
+                "post_ids": [str(post.pk) for post in self.posts],
+                "tag_ids": [str(tag.pk) for tag in tags],
+                "action": action,
+            },
+            content_type="application/json",
+            **self.headers,
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_attach_then_detach(self):
+        with CaptureQueriesContext(connection) as ctx:
+            body = self._bulk("attach", self.tags)
+        writes = [q for q in ctx if q["sql"].startswith(("INSERT", "DELETE"))]
+        self.assertEqual(len(writes), 1)
+        self.assertEqual((body["changed"], body["unchanged"]), (11, 1))
+        self.assertEqual(models.Post.tags.through.objects.count(), 12)
+
+        body = self._bulk("detach", self.tags[:2])
+        self.assertEqual(body["changed"], 8)
+        self.posts[0].refresh_from_db()
+        self.assertEqual(self.posts[0].tag_count, 1)
+
+
+@override_settings(EXPORT_CHUNK_SIZE=2)
+class ExportTest(AuthorTestCase):
+    username = "ivy.lane"
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.posts = [
+            models.Post.objects.create(author=cls.author, title=f"P{i}", content="C")
+            for i in range(5)
+        ]
+
+    async def _export(self, fmt: str) -> tuple[str, list[bytes]]:
+        response = await self.async_client.get(
+            f"/api/posts/export?format={fmt}",
+            headers={"Authorization": self.headers["HTTP_AUTHORIZATION"]},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        chunks = [chunk async for chunk in response.streaming_content]
+        return response.headers["Content-Type"], chunks
+
+    async def test_ndjson(self):
+        content_type, chunks = await self._export("ndjson")
+        self.assertEqual(content_type, "application/x-ndjson")
+        self.assertEqual(len(chunks), 3)
+        rows = [json.loads(line) for line in b"".join(chunks).splitlines()]
+        self.assertEqual(
+            [row["title"] for row in rows], [f"P{i}" for i in reversed(range(5))]
+        )
+        self.assertEqual(rows[0]["author"]["username"], "ivy.lane")
+
+    async def test_csv(self):
+        content_type, chunks = await self._export("csv")
+        self.assertEqual(content_type, "text/csv")
+        rows = list(csv.DictReader(StringIO(b"".join(chunks).decode())))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]["author.username"], "ivy.lane")
+
+
+class ImportTest(AuthorTestCase):
+    username = "noah.reed"
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        models.Tag.objects.create(name="taken")
+
+    def test_refs_batches_and_errors(self):
+        lines = [
+            {"model": "post", "ref": "p1", "data": {"title": "T", "content": "C"}},
+            {"model": "comment", "data": {"post_id": "p1", "content": "c1"}},
+            {"model": "tag", "data": {"name": "taken"}},
+            {"model": "comment", "data": {"post_id": "p1", "content": "c2"}},
+            {"model": "post", "data": {"title": "T"}},
+        ]
+        response = self.client.post(
+            "/api/import?batch_size=2",
+            b"\n".join(json.dumps(line).encode() for line in lines) + b"\nnot json\n",
+            content_type="application/x-ndjson",
+            **self.headers,
+        )
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body["created"]["post"], 1)
+        self.assertEqual(body["created"]["comment"], 2)
+        self.assertEqual([batch["lines"] for batch in body["batches"]], [2, 2, 2])
+        errors = {error["line"]: error["errors"] for error in body["errors"]["details"]}
+        self.assertEqual(errors[3], {"name": "already exists"})
+        self.assertEqual(set(errors), {3, 5, 6})
+        post = models.Post.objects.get(author=self.author)
+        self.assertEqual(post.comment_count, 2)
+
+
+class RendererTest(SimpleTestCase):
+    def test_matches_ninja_aio_renderer(self):
+        data = {
+            "items": [
+                {"id": uuid4(), "at": timezone.now(), "ip": IPv4Address("127.0.0.1")}
+            ],
+            "raw": b"\x00bytes",
+            "next": None,
+        }
+        self.assertEqual(
+            ORJSONRenderer().render(None, dict(data), response_status=200),
+            BaseORJSONRenderer().render(None, dict(data), response_status=200),
+        )
+
+
+class SchemaWarmupTest(SimpleTestCase):
+    def test_built_once_at_startup(self):
+        self.assertIsNotNone(apps.get_app_config("api").schemas_build_time)
+        for model in (models.Author, models.Post, models.Comment, models.Tag):
+            self.assertIn((model, "Out", 1), models._schemas)
+            self.assertIs(model.generate_read_s(), model.generate_read_s())
+            self.assertIs(model.generate_create_s(), model.generate_create_s())
+
+
+class SparseFieldsTest(AuthorTestCase):
+    username = "zoe.park"
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.post = models.Post.objects.create(
+            author=cls.author, title="Title", content="Content"
+        )
+
+    def setUp(self):
+        super().setUp()
+        response_cache.clear()
+
+    def test_list_narrows_query_and_output(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/posts?fields=id,title", **self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()["items"], [{"id": str(self.post.pk), "title": "Title"}]
+        )
+        page_query = ctx.captured_queries[-1]["sql"]
+        self.assertNotIn("content", page_query)
+        self.assertNotIn("api_author", page_query)
+
+    def test_retrieve_and_unknown_fields(self):
+        response = self.client.get(
+            f"/api/posts/{self.post.pk}?fields=author", **self.headers
+        )
+        self.assertEqual(response.json()["author"]["username"], "zoe.park")
+        self.assertEqual(len(response.json()), 1)
+        response = self.client.get("/api/posts?fields=id,password", **self.headers)
+        self.assertEqual(response.status_code, 400)
+
+
+class ExcerptTest(AuthorTestCase):
+    username = "eli.stone"
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.post = models.Post.objects.create(
+            author=cls.author, title="Long", content="word " * 100
+        )
+        models.Comment.objects.create(author=cls.author, post=cls.post, content="Hi")
+
+    def setUp(self):
+        super().setUp()
+        response_cache.clear()
+
+    def test_stored_on_save_and_filled_in_sql(self):
+        self.assertEqual(len(self.post.excerpt), excerpts.EXCERPT_LENGTH)
+        self.assertTrue(self.post.excerpt.endswith(excerpts.ELLIPSIS))
+        models.Post.objects.update(excerpt="")
+        excerpts.fill_all()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.excerpt, excerpts.make_excerpt(self.post.content))
+
+    def test_lists_leave_content_out(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/comments", **self.headers)
+        (comment,) = response.json()["items"]
+        self.assertNotIn("content", comment)
+        self.assertNotIn("content", comment["post"])
+        self.assertNotIn('"content"', ctx.captured_queries[-1]["sql"])
+
+        response = self.client.get("/api/posts", **self.headers)
+        self.assertNotIn("content", response.json()["items"][0])
+        response = self.client.get(f"/api/posts/{self.post.pk}", **self.headers)
+        self.assertEqual(response.json()["content"], self.post.content)
+
+
+class PostDetailTest(AuthorTestCase):
+    username = "ada.reed"
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.post = models.Post.objects.create(
+            author=cls.author, title="Title", content="Content"
+        )
+        cls.post.tags.add(models.Tag.objects.create(name="detail"))
+        cls.post.categories.add(models.Category.objects.create(name="detail"))
+        for i in range(5):
+            models.Comment.objects.create(
+                author=cls.author, post=cls.post, content=f"Comment {i}"
+            )
+
+    def setUp(self):
+        super().setUp()
+        response_cache.clear()
+
+    def test_compound_document_in_fixed_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(
+                f"/api/posts/{self.post.pk}/detail?comments=3", **self.headers
+            )
+        self.assertEqual(response.status_code, 200)
+        # Authentication, then post, tags, categories and comments.
+        self.assertEqual(len(ctx), 5)
+        data = response.json()
+        self.assertEqual(data["post"]["author"]["username"], "ada.reed")
+        self.assertEqual(data["post"]["content"], "Content")
+        self.assertEqual([tag["name"] for tag in data["tags"]], ["detail"])
+        self.assertEqual(len(data["categories"]), 1)
+        self.assertEqual(
+            [comment["content"] for comment in data["comments"]],
+            ["Comment 4", "Comment 3", "Comment 2"],
+        )
+        self.assertNotIn("post", data["comments"][0])
+
+    def test_missing_post(self):
+        response = self.client.get(
+            f"/api/posts/{self.author.pk}/detail", **self.headers
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class TaxonomyTest(AuthorTestCase):
+    username = "ivy.cole"
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.posts = [
+            models.Post.objects.create(author=cls.author, title=f"P{i}", content="C")
+            for i in range(3)
+        ]
+        cls.python = models.Tag.objects.create(name="python")
+        cls.django = models.Tag.objects.create(name="django")
+        cls.web = models.Category.objects.create(name="web")
+        cls.python.posts.add(*cls.posts[:2])
+        cls.django.posts.add(cls.posts[0], cls.posts[2])
+        cls.web.posts.add(*cls.posts)
+
+    def setUp(self):
+        super().setUp()
+        response_cache.clear()
+        taxonomy_index.clear()
+
+    def _titles(self, query: str) -> list[str]:
+        response = self.client.get(f"/api/posts?{query}", **self.headers)
+        self.assertEqual(response.status_code, 200)
+        return [post["title"] for post in response.json()["items"]]
+
+    def test_filters(self):
+        self.assertEqual(self._titles("tags=python,django&categories=web"), ["P0"])
+        self.assertEqual(self._titles("tags=python&title=1"), ["P1"])
+        self.assertEqual(self._titles("tags=missing"), [])
+        with override_settings(TAXONOMY_FILTER_MAX_IDS=1):
+            self.assertEqual(self._titles("tags=python,django"), ["P0"])
+
+    def test_filter_at_the_id_cap(self):
+        posts = models.Post.objects.bulk_create(
+            models.Post(author=self.author, title=f"Bulk {i}", content="C")
+            for i in range(settings.TAXONOMY_FILTER_MAX_IDS + 1)
+        )
+        tag = models.Tag.objects.create(name="bulk")
+        tag.posts.add(*posts[:-1])
+        query = "tags=bulk&title=Bulk&page_size=5"
+        with CaptureQueriesContext(connection) as ctx:
+            page = self._titles(query)
+        self.assertNotIn("api_tag_posts", ctx[-1]["sql"])
+
+        # One post past the cap, the page comes from a join.
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.posts.add(posts[-1])
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self._titles(query), [posts[-1].title, *page[:-1]])
+        self.assertIn("api_tag_posts", ctx[-1]["sql"])
+
+    def test_cloud_and_updates(self):
+        # Loads the index and caches the author.
+        self.client.get("/api/tags/cloud", **self.headers)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get("/api/tags/cloud", **self.headers)
+        self.assertEqual(len(ctx), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.posts[2].tags.add(self.python)
+            self.django.posts.clear()
+            self.posts[1].delete()
+        response = self.client.get("/api/tags/cloud", **self.headers)
+        self.assertEqual(
+            response.json(),
+            [{"name": "python", "posts": 2}, {"name": "django", "posts": 0}],
+        )
+        self.assertEqual(self._titles("tags=python"), ["P2", "P0"])
+
+
+class FeedTest(AuthorTestCase):
+    username = "kai.moss"
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.post = models.Post.objects.create(
+            author=cls.author, title="Title", content="Content"
+        )
+        cls.comment = models.Comment.objects.create(
+            author=cls.author, post=cls.post, content="Comment"
+        )
+
+    def setUp(self):
+        super().setUp()
+        response_cache.clear()
+
+    def _feed(self) -> list[tuple]:
+        response = self.client.get("/api/activities/by-me", **self.headers)
+        self.assertEqual(response.status_code, 200)
+        return [
+            (item["kind"], item["title"], item["excerpt"], item["post_id"])
+            for item in response.json()["items"]
+        ]
+
+    def test_posts_and_comments_merged(self):
+        with CaptureQueriesContext(connection) as ctx:
+            feed = self._feed()
+        post_id = str(self.post.pk)
+        self.assertEqual(
+            feed,
+            [("comment", "", "Comment", post_id), ("post", "Title", "Content", post_id)],
+        )
+        page_query = ctx.captured_queries[-1]["sql"]
+        self.assertIn('FROM "api_activity"', page_query)
+        self.assertNotIn("JOIN", page_query)
+
+    def test_maintained_on_write(self):
+        self.post.title = "Renamed"
+        self.post.save()
+        models.Comment.objects.create(author=self.author, post=self.post, content="2")
+        self.assertEqual(
+            [(kind, title) for kind, title, *_ in self._feed()],
+            [("comment", ""), ("comment", ""), ("post", "Renamed")],
+        )
+        self.assertEqual(self.author.activities.count(), 3)
+        self.post.delete()
+        self.assertEqual(self._feed(), [])
+
+
+class MetricsTest(AuthorTestCase):
+    username = "noa.king"
+
+    def setUp(self):
+        super().setUp()
+        response_cache.clear()
+        registry.clear()
+
+    def test_histograms_per_route(self):
+        self.client.get("/api/comments", **self.headers)
+        response = self.client.get("/metrics")
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        lines = response.content.decode().splitlines()
+        labels = 'method="GET",route="/api/comments"'
+        self.assertIn(f"api_request_seconds_count{{{labels}}} 1", lines)
+        sums = {
+            line.split("{")[0]: float(line.split()[-1])
+            for line in lines
+            if line.startswith("api_") and f"_sum{{{labels}}}" in line
+        }
+        self.assertGreaterEqual(sums["api_queries_sum"], 1)
+        # Serialization includes the encoding of the body.
+        self.assertGreater(sums["api_serialize_seconds_sum"], 0)
+        self.assertGreater(
+            sums["api_serialize_seconds_sum"], sums["api_render_seconds_sum"]
+        )
+        self.assertFalse(any("/metrics" in line for line in lines))
+
+    @override_settings(METRICS_ALLOWED_IPS=[], METRICS_TOKEN="s3cret")
+    def test_access(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer nope")
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer s3cret")
+        self.assertEqual(response.status_code, 200)
+        with override_settings(METRICS_TOKEN=None):
+            response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer None")
+            self.assertEqual(response.status_code, 403)
+
+    @override_settings(QUERY_BUDGET=1, QUERY_BUDGET_RAISE=True)
+    def test_query_budget(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get("/api/comments", **self.headers)
+        with override_settings(QUERY_BUDGET_RAISE=False), self.assertLogs(
+            "api.metrics", "WARNING"
+        ):
+            self.client.get("/api/comments", **self.headers)
+
+
+class LoadDataTest(TestCase):
+    def _counts(self) -> dict[str, int]:
+        return {
+            model.__name__: model.objects.count()
+            for model in (
+                models.Author,
+                models.Post,
+                models.Comment,
+                models.Tag,
+                models.Category,
+                models.Post.tags.through,
+                models.Activity,
+            )
+        }
+
+    def test_rerun_loads_nothing_twice(self):
+        call_command("load_data", scale=2, seed=1, stdout=StringIO())
+        counts = self._counts()
+        self.assertEqual(counts["Post"], 2 * len(POSTS_DATA))
+        call_command("load_data", scale=2, seed=2, stdout=StringIO())
+        self.assertEqual(self._counts(), counts)
+        call_command("load_data", scale=3, seed=3, stdout=StringIO())
+        self.assertEqual(models.Post.objects.count(), 3 * len(POSTS_DATA))
+        self.assertEqual(models.Comment.objects.count(), counts["Comment"] // 2 * 3)
+
+
+class LoadTestTest(TestCase):
+    def test_needs_debug_or_force(self):
+        with self.assertRaisesMessage(CommandError, "--force"):
+            call_command("load_test", users=1, duration=0.1, stdout=StringIO())
+
+    def test_run_and_compare(self):
+        # Not seeded by load_test, left alone despite its username.
+        create_author("loadtest.fan", first_name="Real", last_name="Author")
+        with tempfile.TemporaryDirectory() as tmp:
+            baseline = Path(tmp) / "baseline.json"
+            call_command(
+                "load_test",
+                users=2,
+                duration=0.2,
+                burst=2,
+                seed=1,
+                save_baseline=baseline,
+                force=True,
+                stdout=StringIO(),
+            )
+            results = json.loads(baseline.read_text())["results"]
+            self.assertIn("POST /api/login", results)
+            self.assertTrue(all(row["errors"] == 0 for row in results.values()))
+            self.assertEqual(
+                list(
+                    models.Author.objects.filter(
+                        username__startswith="loadtest."
+                    ).values_list("email", flat=True)
+                ),
+                ["loadtest.fan@example.com"],
+            )
+            out = StringIO()
+            call_command(
+                "load_test",
+                users=2,
+                duration=0.2,
+                baseline=baseline,
+                tolerance=100,
+                force=True,
+                stdout=out,
+            )
+            self.assertIn("No regression", out.getvalue())
+
+    @override_settings(
+        PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"]
+    )
+    def test_without_posts_and_failing_users(self):
+        options = {"users": 2, "duration": 0.3, "seed": 3, "force": True}
+        err = StringIO()
+        weights = {"feed": 1, "comment_burst": 1}
+        with mock.patch.dict(load_test.WEIGHTS, weights, clear=True):
+            call_command("load_test", posts=0, stdout=StringIO(), stderr=err, **options)
+        self.assertEqual(err.getvalue(), "")
+
+        err = StringIO()
+        with mock.patch.object(
+            load_test.Command, "_login", side_effect=RuntimeError("unreachable")
+        ):
+            call_command("load_test", stdout=StringIO(), stderr=err, **options)
+        self.assertEqual(err.getvalue().count("RuntimeError('unreachable')"), 2)
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class BenchmarkHotPathsTest(AuthorTestCase):
+    username = "bo.stone"
+
+    def test_smoke(self):
+        for i in range(3):
+            models.Post.objects.create(author=self.author, title=f"P{i}", content="C")
+        with tempfile.TemporaryDirectory() as tmp:
+            baseline = Path(tmp) / "baseline.json"
+            call_command(
+                "benchmark_hot_paths",
+                runs=2,
+                hash_runs=1,
+                save_baseline=baseline,
+                stdout=StringIO(),
+            )
+            saved = json.loads(baseline.read_text())
+        self.assertEqual(saved["runs"], 2)
+        self.assertEqual(
+            set(saved["results"]),
+            {
+                "encode_jwt",
+                "Author.create_jwt_tokens",
+                "jwt.decode + validate_claims",
+                "AuthorAuth.authenticate (cached token)",
+                "AuthorAuth.authenticate (new token)",
+                "serialize posts (1)",
+                "ModelUtil.read_s posts (1)",
+                "make_password",
+                "acheck_password",
+            },
+        )
+        self.assertEqual(saved["results"]["make_password"]["runs"], 1)
+
+
+class OpenAPITest(SimpleTestCase):
+    def test_operation_ids_unique(self):
+        from api.views import api
+
+        paths = api.get_openapi_schema()["paths"].values()
+        ids = [operation["operationId"] for path in paths for operation in path.values()]
+        self.assertEqual(len(ids), len(set(ids)))
+        # The ids are given per operation: the views shared by several
+        # viewsets keep their function name.
+        names = Counter(
+            operation.view_func.__name__
+            for _, router in api._routers
+            for path_view in router.path_operations.values()
+            for operation in path_view.operations
+            if operation.operation_id
+        )
+        self.assertTrue(names)
+        self.assertGreater(min(names.values()), 1)
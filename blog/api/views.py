@@ -1,4 +1,9 @@
+from typing import List
 from uuid import UUID
+
+from asgiref.sync import sync_to_async
+from django.http import HttpRequest
+from ninja import Query
 from ninja_aio import NinjaAIO
 from ninja_aio.views import APIViewSet, APIView, mixins
 from ninja_aio.schemas import (
@@ -6,56 +11,189 @@ from ninja_aio.schemas import (
     GenericMessageSchema,
     ObjectsQuerySchema,
 )
+from ninja_aio.schemas.helpers import DecoratorsSchema
 from ninja.pagination import paginate
 from ninja_aio.decorators import unique_view, decorate_view, api_get, api_post
 
-from api import models, schema
+from api import metrics, models, schema
 from api.auth import AuthorAuth, RefreshAuth
+from api.batch import BatchViewSetMixin, bulk_relate
+from api.hashing import amake_password, hash_password_input
+from api.importer import Importer
+from api.conditional import NotModified, check_list, conditional_retrieve
+from api.detail import post_detail
+from api.export import ExportViewSetMixin
+from api.pagination import CursorPagination
+from api.renderers import ORJSONRenderer
+from api.response_cache import cache_response, response_cache
+from api.search import search_posts
+from api.sparse import sparse_list, sparse_retrieve, sparse_schema
+from api.taxonomy import TaxonomyViewSetMixin, filter_posts
 
 api = NinjaAIO(title="Blog API", version="1.0.0", auth=AuthorAuth())
+# NinjaAIO takes no renderer argument, its parser already uses orjson.
+api.renderer = ORJSONRenderer()
+metrics.instrument(api)
+
+
+@api.exception_handler(NotModified)
+def not_modified(request: HttpRequest, exc: NotModified):
+    return exc.response
+
+
+class BlogViewSet(APIViewSet):
+    """
+    Viewset base paginating on (created_at, id) keysets.
+
+    List views return the queryset instead of serialized rows, so only the
+    requested page is fetched and serialized. List and retrieve views answer
+    conditional requests (see ``api.conditional``) and, with
+    ``cache_responses``, are cached (see ``api.response_cache``).
+    """
+
+    pagination_class = CursorPagination
+    cache_responses = False
+    # ReadSerializer fields left out of list responses and queries, still
+    # returned on retrieve or when asked for with ?fields=.
+    list_excludes: tuple[str, ...] = ()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.list_fields = tuple(
+            name
+            for name in self.schema_out.model_fields
+            if name not in self.list_excludes
+        )
+        self.list_schema = (
+            sparse_schema(self.schema_out, self.list_fields, "List")
+            if self.list_excludes
+            else self.schema_out
+        )
+        retrieve = [
+            conditional_retrieve(self),
+            sparse_retrieve(self),
+            *self.extra_decorators.retrieve,
+        ]
+        if self.cache_responses:
+            retrieve.insert(0, self.cache_decorator())
+        self.extra_decorators = self.extra_decorators.model_copy(
+            update={"retrieve": retrieve}
+        )
+
+    def add_views_to_route(self):
+        super().add_views_to_route()
+        # Views inherited from mixins are registered by every viewset using
+        # them under the same function: give their operations an id suffixed
+        # with the model, as unique_view names the CRUD views, to keep OpenAPI
+        # operation ids unique. The functions themselves are left alone.
+        for path_view in self.router.path_operations.values():
+            for operation in path_view.operations:
+                method = getattr(type(self), operation.view_func.__name__, None)
+                if operation.operation_id is None and getattr(
+                    method, "__qualname__", ""
+                ).split(".")[0] in {cls.__name__ for cls in type(self).__mro__[1:]}:
+                    operation.operation_id = (
+                        f"{self.api.get_openapi_operation_id(operation)}"
+                        f"_{self.model_util.model_name}"
+                    )
 
+    def cache_dependencies(self) -> set[str]:
+        """Labels of the model and of the relations its ReadSerializer renders."""
+        util = self.model_util
+        names = util.get_select_relateds() + util.get_reverse_relations()
+        return {response_cache.label(self.model)} | {
+            response_cache.label(self.model._meta.get_field(name).related_model)
+            for name in names
+        }
+
+    def cache_decorator(self):
+        if not self.cache_responses:
+            return None
+        return cache_response(
+            self.cache_dependencies(),
+            per_author=issubclass(self.model, models.BaseAuthorRelated),
+        )
 
-class BaseAuthorRelatedAPI(APIViewSet):
+    def list_view(self):
+        @self.router.get(
+            self.get_path,
+            auth=self.get_view_auth(),
+            summary=f"List {self.model._meta.verbose_name_plural.capitalize()}",
+            description=self.list_docs,
+            response={
+                200: List[self.list_schema],
+                self.error_codes: GenericMessageSchema,
+            },
+        )
+        @decorate_view(
+            self.cache_decorator(),
+            sparse_list(self),
+            paginate(self.pagination_class),
+            unique_view(self, plural=True),
+            *self.extra_decorators.list,
+        )
+        async def list(
+            request: HttpRequest,
+            filters: Query[self.filters_schema] = None,  # type: ignore
+        ):
+            qs = await self.model_util.get_objects(
+                request,
+                query_data=self._get_query_data(),
+                is_for_read=True,
+            )
+            if filters is not None:
+                qs = await self.query_params_handler(qs, filters.model_dump())
+            await check_list(request, qs)
+            return qs
+
+        return list
+
+
+class BaseAuthorRelatedAPI(BlogViewSet):
     def views(self):
         @self.router.get(
             "/by-author/{author_id}",
-            response={200: list[self.schema_out], 404: GenericMessageSchema},
+            response={200: list[self.list_schema], 404: GenericMessageSchema},
         )
         @decorate_view(
             unique_view(self),
+            sparse_list(self),
             paginate(self.pagination_class),
         )
         async def get_by_author(request, author_id: UUID):
             """Retrieve all instances related to a specific author."""
-            return await self.model_util.list_read_s(
-                self.schema_out,
+            qs = await self.model_util.get_objects(
                 request,
                 query_data=ObjectsQuerySchema(
                     filters={"author__id": author_id},
                 ),
                 is_for_read=True,
             )
+            await check_list(request, qs)
+            return qs
 
         @self.api.get(
             f"{self.api_route_path}/by-me",
-            response={200: list[self.schema_out], 404: GenericMessageSchema},
+            response={200: list[self.list_schema], 404: GenericMessageSchema},
             auth=AuthorAuth(),
             tags=[self.router_tag],
         )
         @decorate_view(
             unique_view(self),
+            sparse_list(self),
             paginate(self.pagination_class),
         )
         async def get_by_me(request: models.AuthorAuthenticatedRequest):
             """Retrieve all instances related to the authenticated author."""
-            return await self.model_util.list_read_s(
-                self.schema_out,
+            qs = await self.model_util.get_objects(
                 request,
                 query_data=ObjectsQuerySchema(
                     filters={"author": request.author},
                 ),
                 is_for_read=True,
             )
+            await check_list(request, qs)
+            return qs
 
 
 @api.view("/login", tags=["Authentication"])
@@ -66,7 +204,9 @@ class LoginAPI(APIView):
             200: schema.LoginSchemaOut,
             404: GenericMessageSchema,
             401: GenericMessageSchema,
+            503: GenericMessageSchema,
         },
+        auth=None,
     )
     async def login(self, request, data: schema.LoginSchemaIn):
         """Authenticate an author and return JWT tokens."""
@@ -98,6 +238,7 @@ class LoginAPI(APIView):
             200: GenericMessageSchema,
             404: GenericMessageSchema,
             401: GenericMessageSchema,
+            503: GenericMessageSchema,
         },
     )
     async def change_password(
@@ -108,14 +249,34 @@ class LoginAPI(APIView):
         """Change the authenticated author's password."""
         author = request.author
         await author.check_password(data.old_password)
-        author.password = data.new_password
+        author.password = await amake_password(data.new_password)
         await author.asave()
         return {"message": "Password changed successfully."}
 
 
+@api.view("/import", tags=["Import"])
+class ImportAPI(APIView):
+    @api_post("", response={200: schema.ImportSchemaOut})
+    async def import_ndjson(
+        self,
+        request: models.AuthorAuthenticatedRequest,
+        filters: Query[schema.ImportSchemaIn],
+    ):
+        """
+        Import posts, comments, tags and categories from an NDJSON body, one
+        object per line (see ``api.importer``), committing every
+        ``batch_size`` lines.
+        """
+        # Iterating the request reads the spooled body line by line,
+        # request.body would load it whole in memory.
+        importer = Importer(request.author, filters.batch_size)
+        return await sync_to_async(importer.run)(request)
+
+
 @api.viewset(models.Author)
-class AuthorAPI(mixins.IcontainsFilterViewSetMixin):
+class AuthorAPI(mixins.IcontainsFilterViewSetMixin, BlogViewSet):
     post_auth = None  # Allow unauthenticated access to create authors
+    extra_decorators = DecoratorsSchema(create=[hash_password_input])
     disable = ["retrieve"]
     query_params = {
         "username": (str, ""),
@@ -139,7 +300,14 @@ class AuthorAPI(mixins.IcontainsFilterViewSetMixin):
 
 
 @api.viewset(models.Post)
-class PostAPI(mixins.IcontainsFilterViewSetMixin, BaseAuthorRelatedAPI):
+class PostAPI(
+    mixins.IcontainsFilterViewSetMixin,
+    BatchViewSetMixin,
+    ExportViewSetMixin,
+    BaseAuthorRelatedAPI,
+):
+    cache_responses = True
+    list_excludes = ("content",)
     m2m_relations = [
         M2MRelationSchema(
             model=models.Tag,
@@ -154,24 +322,134 @@ class PostAPI(mixins.IcontainsFilterViewSetMixin, BaseAuthorRelatedAPI):
     ]
     query_params = {
         "title": (str, ""),
+        # Comma separated names, posts must have them all.
+        "tags": (str, ""),
+        "categories": (str, ""),
     }
 
+    async def query_params_handler(self, queryset, filters):
+        queryset = await filter_posts(queryset, filters)
+        return await super().query_params_handler(queryset, filters)
+
+    @api_post("/tags/bulk", response={200: schema.RelationsBulkSchemaOut})
+    async def bulk_tags(
+        self,
+        request: models.AuthorAuthenticatedRequest,
+        data: schema.PostTagsBulkSchemaIn,
+    ):
+        """Attach or detach many tags to many of the author's posts at once."""
+        return await bulk_relate(
+            await self.model_util.get_objects(request),
+            models.Tag.objects.all(),
+            models.Post.tags.through,
+            data.post_ids,
+            data.tag_ids,
+            attach=data.action == "attach",
+        )
+
+    @api_post("/categories/bulk", response={200: schema.RelationsBulkSchemaOut})
+    async def bulk_categories(
+        self,
+        request: models.AuthorAuthenticatedRequest,
+        data: schema.PostCategoriesBulkSchemaIn,
+    ):
+        """Attach or detach many categories to many of the author's posts at once."""
+        return await bulk_relate(
+            await self.model_util.get_objects(request),
+            models.Category.objects.all(),
+            models.Post.categories.through,
+            data.post_ids,
+            data.category_ids,
+            attach=data.action == "attach",
+        )
+
+    @api_get(
+        "/{pk}/detail",
+        response={200: schema.PostDetailSchemaOut, 404: GenericMessageSchema},
+        decorators=[
+            cache_response(
+                map(
+                    response_cache.label,
+                    (
+                        models.Post,
+                        models.Author,
+                        models.Tag,
+                        models.Category,
+                        models.Comment,
+                    ),
+                ),
+                per_author=True,
+            )
+        ],
+    )
+    async def detail(
+        self,
+        request: models.AuthorAuthenticatedRequest,
+        pk: UUID,
+        filters: Query[schema.PostDetailSchemaIn],
+    ):
+        """Post with its author, tags, categories and latest comments."""
+        return await post_detail(
+            await self.model_util.get_objects(request, is_for_read=True),
+            pk,
+            filters.comments,
+        )
+
+    @api_get(
+        "/search",
+        response={200: list[models.Post.generate_read_s()], 400: GenericMessageSchema},
+    )
+    async def search(
+        self,
+        request: models.AuthorAuthenticatedRequest,
+        filters: Query[schema.PostSearchSchemaIn],
+    ):
+        """Full-text search on post title and content, best match first."""
+        return await search_posts(
+            await self.model_util.get_objects(request, is_for_read=True),
+            filters.q,
+            limit=filters.limit,
+            offset=filters.offset,
+        )
+
 
 @api.viewset(models.Comment)
-class CommentAPI(BaseAuthorRelatedAPI):
-    pass
+class CommentAPI(BatchViewSetMixin, ExportViewSetMixin, BaseAuthorRelatedAPI):
+    list_excludes = ("content",)
 
 
 @api.viewset(models.Category)
-class CategoryAPI(mixins.IcontainsFilterViewSetMixin):
+class CategoryAPI(
+    mixins.IcontainsFilterViewSetMixin,
+    BatchViewSetMixin,
+    TaxonomyViewSetMixin,
+    BlogViewSet,
+):
+    cache_responses = True
     query_params = {
         "name": (str, ""),
     }
 
 
 @api.viewset(models.Tag)
-class TagAPI(mixins.IcontainsFilterViewSetMixin):
+class TagAPI(
+    mixins.IcontainsFilterViewSetMixin,
+    BatchViewSetMixin,
+    TaxonomyViewSetMixin,
+    BlogViewSet,
+):
     model = models.Tag
+    cache_responses = True
     query_params = {
         "name": (str, ""),
     }
+
+
+@api.viewset(models.Activity)
+class ActivityAPI(BaseAuthorRelatedAPI):
+    """
+    Author feeds of posts and comments, newest first, read from the table
+    maintained by ``api.feed``.
+    """
+
+    disable = ["create", "update", "delete"]
@@ -10,7 +10,12 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 import os
 
 from django.core.asgi import get_asgi_application
+from django.urls import get_resolver
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'blog.settings')
 
 application = get_asgi_application()
+
+# Import the URLconf, and with it build the API routes, when the server
+# starts rather than on the first request.
+get_resolver().url_patterns
@@ -44,6 +44,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -51,6 +52,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.response_cache.ResponseCacheMiddleware',
+    'api.conditional.ValidatorsMiddleware',
 ]
 
 ROOT_URLCONF = 'blog.urls'
@@ -142,4 +145,44 @@ JWT_CHANGE_DURATION = 300
 JWT_ALGORITHM = "RS256"
 JWT_COMMON_ISSUER = "ninja-aio-blog-example"
 
-NINJA_AIO_APPEND_SLASH = False
\ No newline at end of file
+NINJA_AIO_APPEND_SLASH = False
+
+AUTHOR_CACHE_TTL = 60
+AUTHOR_CACHE_MAXSIZE = 1024
+JWT_CACHE_MAXSIZE = 4096
+
+PASSWORD_HASHING_WORKERS = 2
+PASSWORD_HASHING_MAX_PENDING = 32
+
+# "api.response_cache.DjangoCacheBackend" shares entries through CACHES,
+# RESPONSE_CACHE_OPTIONS = {"alias": "default"}.
+RESPONSE_CACHE_BACKEND = "api.response_cache.LocalBackend"
+RESPONSE_CACHE_OPTIONS = {"maxsize": 2048}
+RESPONSE_CACHE_TTL = 300
+
+BATCH_MAX_SIZE = 1000
+
+# Rows fetched and serialized at a time by the export endpoints.
+EXPORT_CHUNK_SIZE = 2000
+# Lines written per transaction by the import endpoint, unless overridden
+# with ?batch_size=.
+IMPORT_BATCH_SIZE = 1000
+
+# Seconds before the per-process taxonomy index (api.taxonomy) is reloaded
+# to see the tag and category changes of other processes.
+TAXONOMY_INDEX_TTL = 600
+# Tag and category filters become an IN list of post ids up to this many
+# ids, and joins past it. Kept well under SQLite's historical limit of 999
+# variables per query, which the other filters and the cursor share.
+TAXONOMY_FILTER_MAX_IDS = 500
+
+# Requests running more queries are logged, or fail with
+# QUERY_BUDGET_RAISE (e.g. in tests). None disables the budget.
+QUERY_BUDGET = None
+QUERY_BUDGET_RAISE = False
+# Queries slower than this are logged with their SQL.
+SLOW_QUERY_SECONDS = 0.5
+# /metrics answers these client addresses, and requests sending
+# "Authorization: Bearer <METRICS_TOKEN>" when a token is set.
+METRICS_ALLOWED_IPS = ["127.0.0.1", "::1"]
+METRICS_TOKEN = None
@@ -1,10 +1,12 @@
 from django.contrib import admin
 from django.urls import path
 
+from api.metrics import metrics_view
 from api.views import api
 
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', api.urls),
+    path('metrics', metrics_view),
 ]